@@ -12,18 +12,51 @@
 import time
 import os
 import logging
+import argparse
+import atexit
+import base64
+import gzip
 import hashlib
 import json
+import math
+import queue
+import random
+import re
+import sqlite3
+import struct
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime, timedelta, date, timezone
 from collections import defaultdict
 from email.utils import parsedate_to_datetime
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
 from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit
 from urllib.request import Request, urlopen
 
 import yaml
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, g, has_app_context
 from clickhouse_driver import Client
+from clickhouse_driver.errors import ServerException, TypeMismatchError
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
 
 try:
     from libretranslatepy import LibreTranslateAPI
@@ -60,6 +93,262 @@ libretranslate_api_key = (
 logger = logging.getLogger(__name__)
 _logged_libretranslate_fallback = False
 
+# Taille et durées de vie du pool de connexions ClickHouse
+CLICKHOUSE_POOL_SIZE = int(gn_config.get("clickhouse_pool_size", 8))
+CLICKHOUSE_POOL_TIMEOUT = float(gn_config.get("clickhouse_pool_timeout", 10))
+CLICKHOUSE_POOL_MAX_IDLE = float(gn_config.get("clickhouse_pool_max_idle", 300))
+CLICKHOUSE_POOL_MAX_LIFETIME = float(gn_config.get("clickhouse_pool_max_lifetime", 3600))
+CLICKHOUSE_POOL_PING_AFTER = float(gn_config.get("clickhouse_pool_ping_after", 30))
+
+
+class PoolTimeout(Exception):
+    """Raised when no ClickHouse connection could be checked out in time."""
+
+
+class ClickHousePool:
+    '''
+        Bounded, thread-safe pool of clickhouse_driver clients.
+
+        A client is never shared between two threads: it is checked out with
+        acquire() (or the connection() context manager) and handed back with
+        release(). Idle clients are health checked before reuse and recycled
+        once they exceed max_idle or max_lifetime seconds.
+    '''
+
+    def __init__(
+        self,
+        host,
+        port,
+        max_size=8,
+        timeout=10.0,
+        max_idle=300.0,
+        max_lifetime=3600.0,
+        ping_after=30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self._cond = threading.Condition()
+        self._idle = []  # (client, last_used), LIFO pour garder les sockets chaudes
+        self._born = {}  # id(client) -> monotonic creation time
+        self._open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.created = 0
+
+    def _new_client(self):
+        return Client(host=self.host, port=self.port)
+
+    def _close(self, client):
+        try:
+            client.disconnect()
+        except Exception:
+            pass
+
+    def _forget(self, client):
+        """Drop a checked-out client from the accounting. Caller holds the lock."""
+        self._born.pop(id(client), None)
+        self._open -= 1
+        self.in_use -= 1
+        self._cond.notify()
+
+    def _healthy(self, client, last_used):
+        now = time.monotonic()
+        born = self._born.get(id(client), now)
+        if self.max_lifetime and now - born > self.max_lifetime:
+            return False
+        if self.max_idle and now - last_used > self.max_idle:
+            return False
+        connection = getattr(client, "connection", None)
+        if connection is None or not connection.connected:
+            return True  # Sera (re)connecté paresseusement au prochain execute
+        if now - last_used > self.ping_after:
+            try:
+                return bool(connection.ping())
+            except Exception:
+                return False
+        return True
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry = None
+            with self._cond:
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f"No ClickHouse connection available after {self.timeout}s"
+                        )
+                    self.waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self.waiting -= 1
+                self.in_use += 1
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    client = self._new_client()
+                    self._open += 1
+                    self.created += 1
+                    self._born[id(client)] = time.monotonic()
+                    return client
+
+            client, last_used = entry
+            if self._healthy(client, last_used):
+                return client
+            with self._cond:
+                self._forget(client)
+            self._close(client)
+
+    def release(self, client, discard=False):
+        with self._cond:
+            born = self._born.get(id(client), time.monotonic())
+            expired = self.max_lifetime and time.monotonic() - born > self.max_lifetime
+            if discard or expired:
+                self._forget(client)
+            else:
+                self.in_use -= 1
+                self._idle.append((client, time.monotonic()))
+                self._cond.notify()
+                return
+        self._close(client)
+
+    @contextmanager
+    def connection(self):
+        client = self.acquire()
+        discard = False
+        try:
+            yield client
+        except ServerException:
+            # Erreur SQL : la socket reste saine et réutilisable
+            raise
+        except BaseException:
+            discard = True
+            raise
+        finally:
+            self.release(client, discard=discard)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            for client, _ in idle:
+                self._born.pop(id(client), None)
+                self._open -= 1
+            self._cond.notify_all()
+        for client, _ in idle:
+            self._close(client)
+
+    def reset_after_fork(self):
+        """Forget the clients inherited from the parent process; their sockets stay with it."""
+        self._cond = threading.Condition()
+        self._idle = []
+        self._born = {}
+        self._open = 0
+        self.in_use = 0
+        self.waiting = 0
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "created": self.created,
+            }
+
+
+clickhouse_pool = ClickHousePool(
+    clickhouse_host,
+    clickhouse_port,
+    max_size=CLICKHOUSE_POOL_SIZE,
+    timeout=CLICKHOUSE_POOL_TIMEOUT,
+    max_idle=CLICKHOUSE_POOL_MAX_IDLE,
+    max_lifetime=CLICKHOUSE_POOL_MAX_LIFETIME,
+    ping_after=CLICKHOUSE_POOL_PING_AFTER,
+)
+
+
+def get_client():
+    '''
+        Return the pooled ClickHouse client bound to the current app context.
+        It is released by release_client() when the context is torn down.
+    '''
+    client = g.get("clickhouse_client")
+    if client is None:
+        client = clickhouse_pool.acquire()
+        g.clickhouse_client = client
+    return client
+
+
+class QueryBatchTimeout(Exception):
+    """Raised when a query batch misses its deadline."""
+
+
+def _execute_pooled(query, params, settings):
+    with clickhouse_pool.connection() as client:
+        return client.execute(query, params, settings=settings)
+
+
+def release_request_client():
+    """Hand the client of the current request back to the pool (get_client() takes a new one)."""
+    if not has_app_context():
+        return
+    client = g.pop("clickhouse_client", None)
+    if client is not None:
+        clickhouse_pool.release(client)
+
+
+def run_query_batch(queries, timeout=None, parallel=True):
+    '''
+        Run independent statements in parallel, each on its own pooled
+        connection, and return {name: rows}.
+
+        `queries` maps a name to a query string or a (query, params) tuple.
+        The whole batch shares one deadline, also pushed to ClickHouse as
+        max_execution_time; the first failing statement cancels the rest.
+        At most QUERY_BATCH_WORKERS statements of all batches run at once,
+        and the request's own client is released first so that a route
+        never waits on itself. parallel=False runs them one after the other
+        on a single connection (background refreshes).
+    '''
+    timeout = QUERY_BATCH_TIMEOUT if timeout is None else timeout
+    settings = {"max_execution_time": max(1, math.ceil(timeout))}
+    release_request_client()
+    if not parallel:
+        deadline = time.monotonic() + timeout
+        results = {}
+        with clickhouse_pool.connection() as client:
+            for name, statement in queries.items():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise QueryBatchTimeout(f"Query batch exceeded {timeout}s")
+                query, params = statement if isinstance(statement, tuple) else (statement, {})
+                settings = {"max_execution_time": max(1, math.ceil(remaining))}
+                results[name] = client.execute(query, params, settings=settings)
+        return results
+    futures = {}
+    for name, statement in queries.items():
+        query, params = statement if isinstance(statement, tuple) else (statement, {})
+        futures[name] = _query_executor.submit(_execute_pooled, query, params, settings)
+
+    done, not_done = wait(futures.values(), timeout=timeout, return_when=FIRST_EXCEPTION)
+    for future in not_done:
+        future.cancel()
+    for future in done:
+        if future.exception() is not None:
+            raise future.exception()
+    if not_done:
+        raise QueryBatchTimeout(f"Query batch exceeded {timeout}s")
+    return {name: future.result() for name, future in futures.items()}
+
 # Liste des colonnes valides pour éviter les injections SQL
 valid_fields = [
     "id",
@@ -84,17 +373,142 @@ valid_fields = [
     "hashtags",
 ]
 
-table_columns = set()
-DATE_COLUMN = "date"
-INSERT_DATE_COLUMN = "insert_date"
-field_aliases = {}
-queryable_fields = set(valid_fields)
-star = ""
-_last_metadata_refresh = 0.0
-METADATA_REFRESH_INTERVAL = 60
-_earliest_date = None
+METADATA_REFRESH_INTERVAL = float(gn_config.get("metadata_refresh_interval", 60))
 FORCE_EXACT_FIELDS = {"chat_id", "username_sender_exact"}
 FORCE_INTEGER_FIELDS = {"chat_id", "username_sender_exact"}
+STATS_REFRESH_INTERVAL = float(gn_config.get("stats_refresh_interval", 300))
+LAST_CHUNK_ROWS = max(1, int(gn_config.get("last_chunk_rows", 5000)))
+# Ingestion en masse : taille des lots colonnaires et nombre d'erreurs détaillées renvoyées
+INGEST_BATCH_ROWS = max(1, int(gn_config.get("ingest_batch_rows", 50000)))
+INGEST_MAX_ERRORS = 100
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+# Position des champs dans un record positionnel (ordre des colonnes de la table)
+RECORD_POSITIONS = dict({name: index for index, name in enumerate(valid_fields)}, msg_id=0)
+DATE_INDEX = RECORD_POSITIONS["date"]
+INSERT_DATE_INDEX = RECORD_POSITIONS["insert_date"]
+# Nombre de fenêtres mensuelles interrogées en parallèle par recherche (1 = séquentiel)
+SEARCH_FANOUT = max(1, int(gn_config.get("search_fanout", 1)))
+# Plafonné à la moitié du pool : le reste reste disponible pour les autres routes
+SEARCH_WORKERS = min(
+    max(1, int(gn_config.get("search_workers", CLICKHOUSE_POOL_SIZE // 2))),
+    max(1, CLICKHOUSE_POOL_SIZE // 2),
+)
+# Nombre de lignes visé par fenêtre de recherche quand system.parts est exploitable
+SEARCH_WINDOW_ROWS = max(1, int(gn_config.get("search_window_rows", 2_000_000)))
+_search_executor = ThreadPoolExecutor(
+    max_workers=SEARCH_WORKERS, thread_name_prefix="search-window"
+)
+# Requêtes indépendantes d'une même route lancées en parallèle
+QUERY_BATCH_TIMEOUT = float(gn_config.get("query_batch_timeout", 30))
+# Toujours bien en dessous de la taille du pool : les autres requêtes doivent garder des connexions
+QUERY_BATCH_WORKERS = min(
+    max(1, int(gn_config.get("query_batch_workers", CLICKHOUSE_POOL_SIZE // 4))),
+    max(1, CLICKHOUSE_POOL_SIZE // 2),
+)
+_query_executor = ThreadPoolExecutor(
+    max_workers=QUERY_BATCH_WORKERS, thread_name_prefix="query-batch"
+)
+
+# Part aléatoire des délais de rafraîchissement (fraction de l'intervalle)
+SNAPSHOT_JITTER = 0.15
+
+
+class PeriodicSnapshot:
+    '''
+        Last value of an expensive loader, refreshed by a daemon thread
+        every `interval` seconds.
+
+        The thread is started on first use rather than at import, so that
+        forking servers do not inherit it. The first get() loads the value
+        synchronously (peek() does not wait); later calls never block on
+        the loader. Every delay is jittered by up to SNAPSHOT_JITTER of the
+        interval so that forked workers do not all refresh at once.
+    '''
+
+    def __init__(self, name, loader, interval):
+        self.name = name
+        self.loader = loader
+        self.interval = interval
+        self._value = None
+        self._taken_at = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def refresh(self):
+        try:
+            value = self.loader()
+        except Exception as exc:
+            logger.warning("Unable to refresh %s snapshot: %s", self.name, exc)
+            return False
+        with self._lock:
+            self._value, self._taken_at = value, time.time()
+        return True
+
+    def _jittered(self, delay):
+        return max(0.0, delay + random.uniform(-SNAPSHOT_JITTER, SNAPSHOT_JITTER) * self.interval)
+
+    def _run(self):
+        if self._taken_at is None:
+            with self._load_lock:
+                if self._taken_at is None:
+                    self.refresh()
+        # Une valeur semée (seed) n'est rechargée qu'une fois son âge écoulé
+        delay = self.interval
+        if self._taken_at is not None:
+            delay = max(0.0, self.interval - (time.time() - self._taken_at))
+        delay = self._jittered(delay)
+        while True:
+            self._wake.wait(delay)
+            self._wake.clear()
+            delay = self._jittered(self.interval)
+            if self._stop.is_set():
+                return
+            self.refresh()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._wake.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=f"{self.name}-refresh", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Ask the thread for a refresh now instead of at the next interval."""
+        self.start()
+        self._wake.set()
+
+    def get(self):
+        """Return (value, taken_at); value is None if nothing could be loaded yet."""
+        self.start()
+        if self._taken_at is None:
+            with self._load_lock:
+                if self._taken_at is None:
+                    self.refresh()
+        with self._lock:
+            return self._value, self._taken_at
+
+    def seed(self, value, taken_at):
+        """Install a value obtained elsewhere (e.g. from disk) if nothing was loaded yet."""
+        with self._lock:
+            if self._taken_at is None:
+                self._value, self._taken_at = value, taken_at
+
+    def peek(self):
+        """Like get(), but never waits for the first load: (None, None) until it lands."""
+        self.start()
+        with self._lock:
+            return self._value, self._taken_at
 
 
 def _normalize_iso_datetime(value: str) -> str:
@@ -110,68 +524,644 @@ def _to_aware_datetime(value) -> datetime:
     return datetime.fromisoformat(normalized)
 
 
-def refresh_earliest_date():
-    global _earliest_date
-    client = None
-    try:
-        client = Client(host=clickhouse_host, port=clickhouse_port)
-        query = f"SELECT min({DATE_COLUMN}) FROM {database_name}.{table_name}"
-        result = client.execute(query)
-        min_date = result[0][0] if result and result[0] else None
-        if isinstance(min_date, datetime):
-            _earliest_date = _to_aware_datetime(min_date)
-        elif min_date is not None:
-            _earliest_date = _to_aware_datetime(str(min_date))
+def read_partition_ranges(date_column):
+    '''
+        Read the populated date ranges of the table from system.parts.
+
+        Returns a list of (min_date, max_date, rows) per partition, newest
+        first, or an empty list unless date_column is the only date column
+        of the partition key (the part min/max would otherwise describe
+        another column, e.g. insert_date).
+    '''
+    with clickhouse_pool.connection() as client:
+        key_columns = client.execute(
+            """
+            SELECT name, type FROM system.columns
+            WHERE database = %(db)s AND table = %(tbl)s AND is_in_partition_key
+            """,
+            {"db": database_name, "tbl": table_name},
+        )
+        date_keys = {name for name, column_type in key_columns if "Date" in column_type}
+        if date_keys != {date_column}:
+            return []
+        rows = client.execute(
+            """
+            SELECT partition,
+                   min(min_time), max(max_time),
+                   min(min_date), max(max_date),
+                   sum(rows)
+            FROM system.parts
+            WHERE database = %(db)s AND table = %(tbl)s AND active AND rows > 0
+            GROUP BY partition
+            """,
+            {"db": database_name, "tbl": table_name},
+        )
+
+    ranges = []
+    for _, min_time, max_time, min_date, max_date, row_count in rows:
+        if isinstance(min_time, datetime) and min_time.year > 1970:
+            lower = _to_aware_datetime(min_time)
+            upper = _to_aware_datetime(max_time)
+        elif isinstance(min_date, date) and min_date.year > 1970:
+            lower = datetime.combine(min_date, datetime.min.time(), timezone.utc)
+            upper = datetime.combine(
+                max_date, datetime.max.time().replace(microsecond=0), timezone.utc
+            )
         else:
-            _earliest_date = None
-    except Exception as exc:
-        logger.warning("Unable to fetch earliest date: %s", exc)
-        _earliest_date = None
-    finally:
-        if client:
-            client.disconnect()
+            # Pas de minmax exploitable sur cette partition : on abandonne le plan
+            return []
+        ranges.append((lower, upper, int(row_count)))
+    ranges.sort(key=lambda item: item[1], reverse=True)
+    return ranges
 
 
-def get_earliest_date():
-    if _earliest_date is None:
-        refresh_earliest_date()
-    return _earliest_date
+def load_earliest_date(date_column):
+    '''
+        (earliest date, partition ranges) of the table: from system.parts
+        when usable, otherwise from a min() scan. Raises when neither can
+        be read; (None, ()) only means an empty table.
+    '''
+    try:
+        ranges = read_partition_ranges(date_column)
+    except Exception as exc:
+        logger.warning("Unable to read partition ranges: %s", exc)
+        ranges = []
+    if ranges:
+        return min(item[0] for item in ranges), tuple(ranges)
+
+    # Une erreur remonte au chargeur : l'instantané précédent est conservé
+    query = f"SELECT min({date_column}) FROM {database_name}.{table_name}"
+    with clickhouse_pool.connection() as client:
+        result = client.execute(query)
+    min_date = result[0][0] if result and result[0] else None
+    if isinstance(min_date, datetime):
+        return _to_aware_datetime(min_date), ()
+    if min_date is not None:
+        return _to_aware_datetime(str(min_date)), ()
+    return None, ()
 
 
 def introspect_table_columns():
-    meta_client = None
     try:
-        meta_client = Client(host=clickhouse_host, port=clickhouse_port)
-        rows = meta_client.execute(
-            "SELECT name FROM system.columns WHERE database = %(db)s AND table = %(tbl)s",
-            {"db": database_name, "tbl": table_name},
-        )
-        return {row[0] for row in rows}
+        with clickhouse_pool.connection() as meta_client:
+            rows = meta_client.execute(
+                "SELECT name, type FROM system.columns WHERE database = %(db)s AND table = %(tbl)s",
+                {"db": database_name, "tbl": table_name},
+            )
+        return {name: column_type for name, column_type in rows}
     except Exception as exc:
         logger.warning(
             "Unable to introspect schema for %s.%s: %s", database_name, table_name, exc
         )
+        return {}
+
+
+# Tables de cumul par expéditeur (sender_chat_id n'est pas dans la clé primaire)
+ROLLUP_TABLES = {
+    "sender_chats": f"{table_name}_sender_chats",
+    "sender_daily": f"{table_name}_sender_daily",
+    "sender_heatmap": f"{table_name}_sender_heatmap",
+}
+
+
+def _rollup_definitions(meta):
+    '''
+        (target DDL, SELECT feeding it, its GROUP BY) for each sender rollup.
+        Targets are AggregatingMergeTree with SimpleAggregateFunction
+        columns, so readers must re-aggregate with sum/min/max/anyLast.
+    '''
+    source = f"{database_name}.{table_name}"
+    return {
+        "sender_chats": (
+            f"""
+            CREATE TABLE IF NOT EXISTS {database_name}.{ROLLUP_TABLES["sender_chats"]} (
+                sender_chat_id Int64,
+                chat_id Int64,
+                chat_name SimpleAggregateFunction(anyLast, String),
+                first_date SimpleAggregateFunction(min, DateTime),
+                last_date SimpleAggregateFunction(max, DateTime),
+                msg_count SimpleAggregateFunction(sum, UInt64),
+                usernames SimpleAggregateFunction(groupUniqArrayArray, Array(String))
+            ) ENGINE = AggregatingMergeTree ORDER BY (sender_chat_id, chat_id)
+            """,
+            f"""
+            SELECT sender_chat_id, chat_id, anyLast(chat_name) AS chat_name,
+                   min({meta.date_column}) AS first_date, max({meta.date_column}) AS last_date,
+                   toUInt64(count()) AS msg_count, groupUniqArray(username) AS usernames
+            FROM {source}
+            """,
+            "GROUP BY sender_chat_id, chat_id",
+        ),
+        "sender_daily": (
+            f"""
+            CREATE TABLE IF NOT EXISTS {database_name}.{ROLLUP_TABLES["sender_daily"]} (
+                sender_chat_id Int64,
+                day Date,
+                chat_id Int64,
+                chat_name SimpleAggregateFunction(anyLast, String),
+                msg_count SimpleAggregateFunction(sum, UInt64)
+            ) ENGINE = AggregatingMergeTree ORDER BY (sender_chat_id, day, chat_id)
+            """,
+            f"""
+            SELECT sender_chat_id, toDate({meta.date_column}) AS day, chat_id,
+                   anyLast(chat_name) AS chat_name, toUInt64(count()) AS msg_count
+            FROM {source}
+            """,
+            "GROUP BY sender_chat_id, day, chat_id",
+        ),
+        "sender_heatmap": (
+            f"""
+            CREATE TABLE IF NOT EXISTS {database_name}.{ROLLUP_TABLES["sender_heatmap"]} (
+                sender_chat_id Int64,
+                day_of_week UInt8,
+                hour UInt8,
+                msg_count SimpleAggregateFunction(sum, UInt64)
+            ) ENGINE = AggregatingMergeTree ORDER BY (sender_chat_id, day_of_week, hour)
+            """,
+            f"""
+            SELECT sender_chat_id, toDayOfWeek({meta.date_column}) AS day_of_week,
+                   toHour({meta.date_column}) AS hour, toUInt64(count()) AS msg_count
+            FROM {source}
+            """,
+            "GROUP BY sender_chat_id, day_of_week, hour",
+        ),
+    }
+
+
+def rollup_table(name):
+    return f"{database_name}.{ROLLUP_TABLES[name]}"
+
+
+def _existing_tables(names):
+    """Subset of `names` that exist in database_name (None if unknown)."""
+    try:
+        with clickhouse_pool.connection() as client:
+            rows = client.execute(
+                "SELECT name FROM system.tables WHERE database = %(db)s AND name IN %(names)s",
+                {"db": database_name, "names": tuple(names)},
+            )
+    except Exception as exc:
+        logger.warning("Unable to list tables: %s", exc)
+        return None
+    return {row[0] for row in rows}
+
+
+# Tables dérivées dont le remplissage initial (backfill) est terminé
+DERIVED_STATE_TABLE = f"{database_name}.{table_name}_derived_state"
+# Délai entre la création de la vue de staging et la borne du backfill
+DERIVED_BACKFILL_MARGIN = 10
+
+
+def _backfilled_tables(tables):
+    """Subset of `tables` (database.name) whose backfill has completed."""
+    try:
+        with clickhouse_pool.connection() as client:
+            rows = client.execute(
+                f"SELECT DISTINCT name FROM {DERIVED_STATE_TABLE} WHERE name IN %(names)s",
+                {"names": tuple(tables)},
+            )
+    except Exception as exc:
+        # Table absente tant qu'aucune commande create-* n'a été lancée
+        if "doesn't exist" not in str(exc):
+            logger.warning("Unable to read %s: %s", DERIVED_STATE_TABLE, exc)
         return set()
-    finally:
-        if meta_client:
-            try:
-                meta_client.disconnect()
-            except Exception:
-                pass
+    return {row[0] for row in rows}
 
 
-def refresh_table_metadata():
-    global table_columns, DATE_COLUMN, INSERT_DATE_COLUMN, field_aliases, queryable_fields, star, _last_metadata_refresh
-    columns = introspect_table_columns()
-    if not columns:
-        columns = set()
-    table_columns = columns
-    DATE_COLUMN = (
+def detect_rollups():
+    """True when every sender rollup table exists and has been back-filled."""
+    tables = {rollup_table(name) for name in ROLLUP_TABLES}
+    return _backfilled_tables(tables) == tables
+
+
+# Traductions faites à l'ingestion (voir TranslationPipeline)
+TRANSLATIONS_TABLE = f"{table_name}_translations"
+
+
+def detect_translations():
+    """True when the ingest-time translations side table exists."""
+    return TRANSLATIONS_TABLE in (_existing_tables([TRANSLATIONS_TABLE]) or ())
+
+
+def _filtered_select(select, group_by, condition):
+    return f"{select.rstrip()}\n            WHERE {condition}\n            {group_by}"
+
+
+def _create_derived_tables(client, definitions, backfill):
+    '''
+        Create each (table, DDL, SELECT, GROUP BY) target with its
+        materialized view. Readers only use a table once its backfill is
+        recorded in DERIVED_STATE_TABLE.
+
+        A backfill never touches the live table: a staging copy is fed by
+        its own view with the rows inserted from `cutoff` on, filled with
+        the older rows, then swapped in with EXCHANGE TABLES (Atomic
+        database). The live view is then recreated without the cutoff
+        filter, views being bound to their target by UUID.
+
+        Rows inserted during the backfill with an insert_date before
+        `cutoff` (late collectors, imports) reach neither the staging view
+        nor the backfill SELECT, and the view swap leaves a short window:
+        ingest has to be paused while it runs.
+    '''
+    meta = current_metadata()
+    client.execute(
+        f"CREATE TABLE IF NOT EXISTS {DERIVED_STATE_TABLE} "
+        "(name String, backfilled_at DateTime) ENGINE = ReplacingMergeTree ORDER BY name"
+    )
+    for table, ddl, select, group_by in definitions:
+        client.execute(ddl)
+        client.execute(
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {table}_mv TO {table} AS {select} {group_by}"
+        )
+        logger.info("Table %s ready", table)
+        if not backfill:
+            continue
+        staging = f"{table}_staging"
+        client.execute(f"DROP VIEW IF EXISTS {staging}_mv")
+        client.execute(f"DROP TABLE IF EXISTS {staging}")
+        client.execute(f"CREATE TABLE {staging} AS {table}")
+        # La vue de staging existe avant la borne : chaque ligne est soit
+        # diffusée par la vue (insert_date >= cutoff), soit reprise par le backfill
+        cutoff = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(
+            seconds=DERIVED_BACKFILL_MARGIN
+        )
+        cutoff_sql = f"toDateTime('{cutoff:%Y-%m-%d %H:%M:%S}', 'UTC')"
+        client.execute(
+            f"CREATE MATERIALIZED VIEW {staging}_mv TO {staging} AS "
+            + _filtered_select(select, group_by, f"{meta.insert_date_column} >= {cutoff_sql}")
+        )
+        time.sleep(max(0.0, (cutoff - datetime.now(timezone.utc)).total_seconds()))
+        client.execute(
+            f"INSERT INTO {staging} "
+            + _filtered_select(select, group_by, f"{meta.insert_date_column} < {cutoff_sql}")
+        )
+        client.execute(f"EXCHANGE TABLES {table} AND {staging}")
+        # La vue filtrée sur cutoff perdrait les imports d'historique : vue complète
+        client.execute(f"DROP VIEW {table}_mv")
+        client.execute(
+            f"CREATE MATERIALIZED VIEW {table}_mv TO {table} AS {select} {group_by}"
+        )
+        client.execute(f"DROP VIEW {staging}_mv")
+        client.execute(f"DROP TABLE {staging}")
+        client.execute(
+            f"INSERT INTO {DERIVED_STATE_TABLE} (name, backfilled_at) VALUES",
+            [(table, datetime.now(timezone.utc).replace(tzinfo=None))],
+        )
+        logger.info("Table %s back-filled up to %s", table, cutoff)
+
+
+def create_rollups(backfill=False):
+    '''
+        Create the sender rollup tables and their materialized views.
+
+        Routes read the rollups only once they have been back-filled: with
+        backfill, each rollup is rebuilt in a staging table and swapped in
+        (see _create_derived_tables). The cutoff is taken on insert_date as
+        set by the collectors, so their clocks must be in sync with ours,
+        and ingest must be paused until the backfill has completed.
+    '''
+    metadata_snapshot.refresh()
+    meta = current_metadata()
+    definitions = [
+        (rollup_table(name), ddl, select, group_by)
+        for name, (ddl, select, group_by) in _rollup_definitions(meta).items()
+    ]
+    with clickhouse_pool.connection() as client:
+        _create_derived_tables(client, definitions, backfill)
+    metadata_snapshot.refresh()
+
+
+# Tables éclatées pour les recherches sur hashtags et urls (une ligne par élément)
+LOOKUP_TABLES = {
+    "hashtags": f"{table_name}_hashtags",
+    "urls": f"{table_name}_urls",
+}
+
+
+def lookup_table(field):
+    return f"{database_name}.{LOOKUP_TABLES[field]}"
+
+
+def _lookup_definitions(meta):
+    '''
+        (target DDL, SELECT feeding it, GROUP BY) for each exploded lookup table.
+        Both are ordered on the looked-up value first, so exact and prefix
+        lookups are primary-key range reads.
+    '''
+    source = f"{database_name}.{table_name}"
+    return {
+        "hashtags": (
+            f"""
+            CREATE TABLE IF NOT EXISTS {lookup_table("hashtags")} (
+                hashtag_lower String,
+                date DateTime,
+                chat_id Int64,
+                msg_id Int64
+            ) ENGINE = MergeTree ORDER BY (hashtag_lower, date, chat_id, msg_id)
+            """,
+            f"""
+            SELECT arrayJoin(arrayDistinct(arrayMap(h -> lowerUTF8(h), hashtags))) AS hashtag_lower,
+                   {meta.date_column} AS date, chat_id, msg_id
+            FROM {source}
+            """,
+            "",
+        ),
+        "urls": (
+            f"""
+            CREATE TABLE IF NOT EXISTS {lookup_table("urls")} (
+                url String,
+                domain LowCardinality(String),
+                date DateTime,
+                chat_id Int64,
+                msg_id Int64,
+                INDEX domain_idx domain TYPE bloom_filter GRANULARITY 4
+            ) ENGINE = MergeTree ORDER BY (url, date, chat_id, msg_id)
+            """,
+            f"""
+            SELECT arrayJoin(arrayDistinct(urls)) AS url, domain(url) AS domain,
+                   {meta.date_column} AS date, chat_id, msg_id
+            FROM {source}
+            """,
+            "",
+        ),
+    }
+
+
+def detect_lookup_tables():
+    """Fields of LOOKUP_TABLES whose table exists and has been back-filled."""
+    ready = _backfilled_tables(lookup_table(field) for field in LOOKUP_TABLES)
+    return frozenset(field for field in LOOKUP_TABLES if lookup_table(field) in ready)
+
+
+def create_lookup_tables(backfill=False):
+    '''
+        Create the exploded hashtag and url tables and their materialized
+        views; backfill works as for create_rollups(), ingest paused.
+    '''
+    metadata_snapshot.refresh()
+    meta = current_metadata()
+    definitions = [
+        (lookup_table(field), ddl, select, group_by)
+        for field, (ddl, select, group_by) in _lookup_definitions(meta).items()
+    ]
+    with clickhouse_pool.connection() as client:
+        _create_derived_tables(client, definitions, backfill)
+    metadata_snapshot.refresh()
+
+
+# Index de saut plein texte : tokens (mots entiers) et n-grammes (sous-chaînes)
+TEXT_INDEX_COLUMNS = ("text", "chat_name", "document_name")
+NGRAM_SIZE = 3
+# Même découpage que tokenbf_v1 : tout octet non ASCII fait partie d'un mot
+_TOKEN_PATTERN = re.compile("[0-9A-Za-z\u0080-\U0010ffff]+")
+
+
+def text_index_definitions():
+    """(name, expression, type) of the full-text skip indexes."""
+    definitions = []
+    for column in TEXT_INDEX_COLUMNS:
+        definitions.append(
+            (f"{column}_tokens_idx", f"lowerUTF8({column})", "tokenbf_v1(32768, 3, 0)")
+        )
+        definitions.append(
+            (f"{column}_ngram_idx", f"lowerUTF8({column})", f"ngrambf_v1({NGRAM_SIZE}, 65536, 3, 0)")
+        )
+    return definitions
+
+
+def detect_skip_indexes():
+    """Names of the data skipping indexes declared on the table."""
+    try:
+        with clickhouse_pool.connection() as client:
+            rows = client.execute(
+                "SELECT name FROM system.data_skipping_indices WHERE database = %(db)s AND table = %(tbl)s",
+                {"db": database_name, "tbl": table_name},
+            )
+    except Exception as exc:
+        logger.warning("Unable to list skip indexes: %s", exc)
+        return frozenset()
+    return frozenset(row[0] for row in rows)
+
+
+def create_text_indexes(materialize=False):
+    '''
+        Add the full-text skip indexes to the table. New parts get them
+        right away; with materialize, existing parts are rebuilt by a
+        background mutation (see system.mutations for its progress).
+    '''
+    with clickhouse_pool.connection() as client:
+        for name, expression, index_type in text_index_definitions():
+            client.execute(
+                f"ALTER TABLE {database_name}.{table_name} "
+                f"ADD INDEX IF NOT EXISTS {name} {expression} TYPE {index_type} GRANULARITY 1"
+            )
+            logger.info("Skip index %s ready", name)
+            if materialize:
+                client.execute(
+                    f"ALTER TABLE {database_name}.{table_name} MATERIALIZE INDEX {name}"
+                )
+                logger.info("Skip index %s materialization scheduled", name)
+    metadata_snapshot.refresh()
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def text_search_predicate(meta, column_sql, column, method_lower, value):
+    '''
+        (predicate, params, strategy) for a LIKE, ILIKE or TOKEN search on a
+        string column. ILIKE uses the ngram index when the term is at least
+        NGRAM_SIZE characters long; TOKEN (whole words, case-insensitive)
+        uses the token index. strategy is "ngram", "token" or "scan".
+    '''
+    value = str(value)
+    if method_lower == "like":
+        return f"{column_sql} LIKE %(value)s", {"value": f"%{value}%"}, "scan"
+    # Les termes passent par lowerUTF8 comme la colonne : requête et index restent d'accord
+    if method_lower == "token":
+        tokens = list(dict.fromkeys(_TOKEN_PATTERN.findall(value)))
+        if not tokens:
+            raise ValueError("TOKEN search needs at least one word")
+        params = {f"token_{index}": token for index, token in enumerate(tokens)}
+        predicate = " AND ".join(
+            f"hasToken(lowerUTF8({column_sql}), lowerUTF8(%({name})s))" for name in params
+        )
+        indexed = f"{column}_tokens_idx" in meta.skip_indexes
+        return predicate, params, "token" if indexed else "scan"
+    if f"{column}_ngram_idx" in meta.skip_indexes and len(value) >= NGRAM_SIZE:
+        return (
+            f"lowerUTF8({column_sql}) LIKE lowerUTF8(%(value)s)",
+            {"value": f"%{_escape_like(value)}%"},
+            "ngram",
+        )
+    return f"positionCaseInsensitiveUTF8({column_sql}, %(value)s) >0", {"value": value}, "scan"
+
+
+class TableMetadata(NamedTuple):
+    '''
+        Immutable view of the table schema and layout. metadata_snapshot
+        swaps it as a whole, so a request never sees half of a refresh;
+        read it once per request with current_metadata().
+    '''
+
+    columns: frozenset
+    date_column: str
+    insert_date_column: str
+    field_aliases: MappingProxyType
+    queryable_fields: frozenset
+    star: str
+    earliest_date: Optional[datetime] = None
+    partition_ranges: tuple = ()
+    rollups_ready: bool = False
+    translations_ready: bool = False
+    skip_indexes: frozenset = frozenset()
+    lookup_tables: frozenset = frozenset()
+    column_types: MappingProxyType = MappingProxyType({})
+
+
+def _field_expressions(date_column, insert_date_column):
+    """SELECT expression of each of valid_fields, in order (dates as UTC ISO 8601 strings)."""
+    expressions = {field: field for field in valid_fields}
+    expressions["id"] = "msg_id"
+    expressions["date"] = (
+        f"formatDateTime(toTimeZone({date_column}, 'UTC'), '%%Y-%%m-%%dT%%H:%%i:%%S+00:00') AS date"
+    )
+    expressions["insert_date"] = (
+        f"formatDateTime(toTimeZone({insert_date_column}, 'UTC'), '%%Y-%%m-%%dT%%H:%%i:%%S+00:00') AS insert_date"
+    )
+    return expressions
+
+
+def parse_fields(meta, raw_fields, required=()):
+    '''
+        Output fields of a fields= parameter (comma separated string or
+        list), checked against queryable_fields and mapped to valid_fields
+        names, in valid_fields order. `required` fields are always added.
+        Returns None when no projection was asked; raises ValueError.
+    '''
+    if not raw_fields:
+        return None
+    if isinstance(raw_fields, str):
+        raw_fields = raw_fields.split(",")
+    canonical = {
+        "chatname": "chat_name",
+        "username_sender_exact": "sender_chat_id",
+        meta.date_column: "date",
+        meta.insert_date_column: "insert_date",
+    }
+    wanted = set(required)
+    for field in raw_fields:
+        field = str(field).strip()
+        if not field:
+            continue
+        if field not in meta.queryable_fields:
+            raise ValueError(f"Invalid field {field!r} in fields parameter")
+        wanted.add(canonical.get(field, field))
+    return tuple(field for field in valid_fields if field in wanted)
+
+
+def projection_clause(meta, fields):
+    """SELECT list of the given valid_fields names; the full star clause when fields is None."""
+    if not fields:
+        return meta.star
+    expressions = _field_expressions(meta.date_column, meta.insert_date_column)
+    return ", ".join(expressions[field] for field in fields)
+
+
+# Mode extrait : seule une fenêtre du texte autour de la première occurrence est renvoyée
+SNIPPET_MIN_CHARS = 20
+SNIPPET_MAX_CHARS = int(gn_config.get("search_snippet_max_chars", 2000))
+SNIPPET_FIELDS = ("snippet_start", "text_length")
+SNIPPET_RESULT_FIELDS = SNIPPET_FIELDS + ("truncated", "matches")
+
+
+def parse_snippet(raw_value):
+    """Window size of a snippet= parameter, clamped to [SNIPPET_MIN_CHARS, SNIPPET_MAX_CHARS]; None when off."""
+    if raw_value in (None, "", 0, "0"):
+        return None
+    try:
+        size = int(raw_value)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid snippet parameter")
+    if size < 1:
+        raise ValueError("Invalid snippet parameter")
+    return min(max(size, SNIPPET_MIN_CHARS), SNIPPET_MAX_CHARS)
+
+
+def snippet_terms(meta, field, raw_value, method):
+    '''
+        Terms highlighted in a text snippet: the searched value, or its words
+        for a TOKEN search. Empty when the search is not on the text field,
+        in which case the snippet is the beginning of the text.
+    '''
+    if meta.field_aliases.get(field, field) != "text" or field in FORCE_EXACT_FIELDS:
+        return ()
+    value = str(raw_value)
+    if (method or "ILIKE").upper() == "TOKEN":
+        return tuple(dict.fromkeys(_TOKEN_PATTERN.findall(value.lower())))
+    return (value,) if value else ()
+
+
+def snippet_projection(meta, fields, size, table_alias, case_sensitive=False):
+    '''
+        projection_clause() with text cut by ClickHouse to `size` characters
+        starting a quarter window before the first occurrence of
+        %(snippet_term)s (case-insensitive unless case_sensitive), followed
+        by the SNIPPET_FIELDS columns (1-based window start and full text
+        length in characters).
+    '''
+    expressions = _field_expressions(meta.date_column, meta.insert_date_column)
+    column = f"{table_alias}.text"
+    expressions["text"] = f"substringUTF8({column}, snippet_start, {size}) AS text"
+    position = "positionUTF8" if case_sensitive else "positionCaseInsensitiveUTF8"
+    window = (
+        f"greatest(1, toInt64({position}({column}, %(snippet_term)s)) - {size // 4})"
+        " AS snippet_start"
+    )
+    selected = ", ".join(expressions[field] for field in (fields or valid_fields))
+    return f"{selected}, {window}, lengthUTF8({column}) AS text_length"
+
+
+def apply_snippet(text, snippet_start, text_length, terms, case_sensitive=False):
+    '''
+        SNIPPET_RESULT_FIELDS values of a result from its SNIPPET_FIELDS:
+        snippet_start (0-based character offset of the window in the full
+        text), text_length, truncated and matches, the [offset, length] of
+        each term occurrence inside the returned text.
+    '''
+    text = text or ""
+    start = max(int(snippet_start or 1) - 1, 0)
+    length = int(text_length or 0)
+    truncated = start > 0 or start + len(text) < length
+    haystack = text if case_sensitive else text.lower()
+    matches = []
+    # lower() peut changer la longueur de quelques caractères : pas d'offsets faux dans ce cas
+    if len(haystack) == len(text):
+        for term in terms:
+            needle = term if case_sensitive else term.lower()
+            if not needle:
+                continue
+            position = haystack.find(needle)
+            while position >= 0:
+                matches.append([position, len(needle)])
+                position = haystack.find(needle, position + len(needle))
+    return start, length, truncated, sorted(matches)
+
+
+def build_table_metadata(columns, **layout):
+    '''
+        TableMetadata for the given column names; the date columns fall back
+        to their *_utc variants when the plain ones are missing.
+    '''
+    columns = frozenset(columns)
+    date_column = (
         "date"
         if "date" in columns or not columns
         else ("date_utc" if "date_utc" in columns else "date")
     )
-    INSERT_DATE_COLUMN = (
+    insert_date_column = (
         "insert_date"
         if "insert_date" in columns or not columns
         else (
@@ -181,54 +1171,195 @@ def refresh_table_metadata():
         )
     )
     field_aliases = {
-        "date": DATE_COLUMN,
-        "insert_date": INSERT_DATE_COLUMN,
-        DATE_COLUMN: DATE_COLUMN,
-        INSERT_DATE_COLUMN: INSERT_DATE_COLUMN,
+        "date": date_column,
+        "insert_date": insert_date_column,
+        date_column: date_column,
+        insert_date_column: insert_date_column,
         "username_sender_exact": "sender_chat_id",
         "chatname": "chat_name",
     }
-    queryable_fields = set(valid_fields) | set(field_aliases.keys())
-    star_clause = f""" msg_id,
-        chat_id,
-        chat_name,
-        username,
-        sender_chat_id,
-        title,
-        formatDateTime(toTimeZone({DATE_COLUMN}, 'UTC'), '%%Y-%%m-%%dT%%H:%%i:%%S+00:00') AS date,
-        formatDateTime(toTimeZone({INSERT_DATE_COLUMN}, 'UTC'), '%%Y-%%m-%%dT%%H:%%i:%%S+00:00') AS insert_date,
-        document_present,
-        document_name,
-        document_type,
-        document_size,
-        msg_fwd,
-        msg_fwd_username,
-        msg_fwd_title,
-        msg_fwd_id,
-        text,
-        lang,
-        urls,
-        hashtags"""
-    star = star_clause
-    _last_metadata_refresh = time.time()
-    refresh_earliest_date()
-
-
-def ensure_table_metadata(force=False):
-    global _last_metadata_refresh
-    if force or not table_columns:
-        refresh_table_metadata()
+    star_clause = " " + ",\n        ".join(
+        _field_expressions(date_column, insert_date_column).values()
+    )
+    return TableMetadata(
+        columns=columns,
+        date_column=date_column,
+        insert_date_column=insert_date_column,
+        field_aliases=MappingProxyType(field_aliases),
+        queryable_fields=frozenset(valid_fields) | frozenset(field_aliases),
+        star=star_clause,
+        **layout,
+    )
+
+
+def load_table_metadata():
+    '''
+        Loader of metadata_snapshot. Raises when the schema cannot be read,
+        so that the last good snapshot is kept.
+    '''
+    columns = introspect_table_columns()
+    if not columns:
+        raise RuntimeError(f"no columns found for {database_name}.{table_name}")
+    meta = build_table_metadata(columns, column_types=MappingProxyType(columns))
+    earliest_date, partition_ranges = load_earliest_date(meta.date_column)
+    meta = meta._replace(
+        earliest_date=earliest_date,
+        partition_ranges=partition_ranges,
+        rollups_ready=detect_rollups(),
+        translations_ready=detect_translations(),
+        skip_indexes=detect_skip_indexes(),
+        lookup_tables=detect_lookup_tables(),
+    )
+    save_table_metadata(meta)
+    return meta
+
+
+METADATA_CACHE_PATH = os.path.join(
+    THIS_DIR, gn_config.get("metadata_cache_path") or "metadata_snapshot.json"
+)
+_saved_metadata = None
+
+
+def _metadata_to_json(meta):
+    return {
+        "database": database_name,
+        "table": table_name,
+        "columns": sorted(meta.columns),
+        "date_column": meta.date_column,
+        "insert_date_column": meta.insert_date_column,
+        "star": meta.star,
+        "earliest_date": meta.earliest_date.isoformat() if meta.earliest_date else None,
+        "partition_ranges": [
+            [lower.isoformat(), upper.isoformat(), rows]
+            for lower, upper, rows in meta.partition_ranges
+        ],
+        "rollups_ready": meta.rollups_ready,
+        "translations_ready": meta.translations_ready,
+        "skip_indexes": sorted(meta.skip_indexes),
+        "lookup_tables": sorted(meta.lookup_tables),
+        "column_types": dict(meta.column_types),
+    }
+
+
+def save_table_metadata(meta):
+    '''
+        Persist meta to METADATA_CACHE_PATH (atomically, and only when it
+        changed) so the next start can skip the ClickHouse round trips.
+    '''
+    global _saved_metadata
+    document = _metadata_to_json(meta)
+    if document == _saved_metadata:
         return
-    if time.time() - _last_metadata_refresh > METADATA_REFRESH_INTERVAL:
-        refresh_table_metadata()
+    temporary = f"{METADATA_CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w") as handle:
+            json.dump(dict(document, saved_at=time.time()), handle)
+        os.replace(temporary, METADATA_CACHE_PATH)
+        _saved_metadata = document
+    except OSError as exc:
+        logger.warning("Unable to persist table metadata to %s: %s", METADATA_CACHE_PATH, exc)
+
+
+def load_saved_metadata():
+    '''
+        (TableMetadata, saved_at) from METADATA_CACHE_PATH, or (None, None)
+        when the file is missing, unreadable or describes another table.
+    '''
+    global _saved_metadata
+    try:
+        with open(METADATA_CACHE_PATH) as handle:
+            document = json.load(handle)
+        saved_at = float(document.pop("saved_at"))
+        if (document.get("database"), document.get("table")) != (database_name, table_name):
+            return None, None
+        meta = build_table_metadata(document["columns"])._replace(
+            date_column=document["date_column"],
+            insert_date_column=document["insert_date_column"],
+            star=document["star"],
+            earliest_date=(
+                _to_aware_datetime(document["earliest_date"])
+                if document["earliest_date"]
+                else None
+            ),
+            partition_ranges=tuple(
+                (_to_aware_datetime(lower), _to_aware_datetime(upper), int(rows))
+                for lower, upper, rows in document["partition_ranges"]
+            ),
+            rollups_ready=bool(document["rollups_ready"]),
+            translations_ready=bool(document["translations_ready"]),
+            skip_indexes=frozenset(document.get("skip_indexes", ())),
+            lookup_tables=frozenset(document.get("lookup_tables", ())),
+            column_types=MappingProxyType(document.get("column_types", {})),
+        )
+    except FileNotFoundError:
+        return None, None
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        logger.warning("Ignoring saved table metadata %s: %s", METADATA_CACHE_PATH, exc)
+        return None, None
+    _saved_metadata = document
+    return meta, saved_at
+
+
+_DEFAULT_METADATA = build_table_metadata(())
+metadata_snapshot = PeriodicSnapshot("metadata", load_table_metadata, METADATA_REFRESH_INTERVAL)
+
+
+def current_metadata():
+    '''
+        Latest TableMetadata; never waits for a refresh. Defaults to the
+        plain column names until a first snapshot has been loaded.
+    '''
+    meta, _ = metadata_snapshot.peek()
+    return meta or _DEFAULT_METADATA
+
+
+# Démarrage : le dernier instantané sauvegardé évite d'interroger ClickHouse,
+# il est revalidé en arrière-plan une fois son âge dépassé
+_saved, _saved_at = load_saved_metadata()
+if _saved is not None:
+    metadata_snapshot.seed(_saved, _saved_at)
+else:
+    metadata_snapshot.refresh()
+del _saved, _saved_at
+
+
+@app.teardown_appcontext
+def release_client(exc):
+    client = g.pop("clickhouse_client", None)
+    if client is not None:
+        discard = exc is not None and not isinstance(exc, ServerException)
+        clickhouse_pool.release(client, discard=discard)
 
 
-refresh_table_metadata()
+@app.errorhandler(QueryBatchTimeout)
+def query_batch_timeout(exc):
+    logger.warning("ClickHouse query batch timed out: %s", exc)
+    return jsonify({"error": str(exc)}), 504
 
 
-@app.before_request
-def sync_metadata():
-    ensure_table_metadata()
+@app.errorhandler(PoolTimeout)
+def pool_exhausted(exc):
+    logger.warning("ClickHouse pool exhausted: %s", exc)
+    return jsonify({"error": str(exc)}), 503
+
+
+@app.route("/pool_stats", methods=["GET"])
+def pool_stats():
+    """
+    Gauges of the ClickHouse connection pool.
+    """
+    return jsonify(clickhouse_pool.stats())
+
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    """
+    Counters of the in-process search result cache and of the translation cache.
+    """
+    stats = dict(search_cache.stats(), translation=translation_cache.stats())
+    if translation_pipeline is not None:
+        stats["translation_pipeline"] = translation_pipeline.stats()
+    return jsonify(stats)
 
 
 def should_refresh_schema(error: Exception) -> bool:
@@ -237,20 +1368,51 @@ def should_refresh_schema(error: Exception) -> bool:
     return any(keyword in message for keyword in keywords)
 
 
-def _execute_search_once(
-    field,
-    raw_value,
-    method,
-    count,
-    *,
-    upper_bound=None,
-    lower_bound=None,
-    fetch_extra=False,
-):
-    start_time = time.time()
-    client = Client(host=clickhouse_host, port=clickhouse_port)
-    query_limit = count + 1 if fetch_extra else count
-    db_field = field_aliases.get(field, field)
+def _lookup_predicate(db_field, method_lower, value, table_alias, lookup_window):
+    '''
+        Match the keys found in the exploded table of db_field, then keep
+        only the rows of those keys. Hashtags are stored lowercased, so
+        case-sensitive (LIKE, IS) hashtag searches read the lowercased
+        lookup and re-check the row itself.
+    '''
+    column = "hashtag_lower" if db_field == "hashtags" else "url"
+    params = {"value": value}
+    if method_lower == "like" and db_field == "hashtags":
+        # Minuscules côté serveur, avec le même lowerUTF8 que la table éclatée
+        lookup = f"{column} LIKE lowerUTF8(%(lookup_value)s)"
+        params["lookup_value"] = f"%{_escape_like(value)}%"
+        params["value"] = f"%{value}%"
+        check = f" AND arrayExists(u -> u LIKE %(value)s, {table_alias}.{db_field})"
+    elif method_lower == "like":
+        lookup = f"{column} LIKE %(value)s"
+        params["value"] = f"%{value}%"
+        check = ""
+    elif method_lower in ("ilike", "token"):
+        lookup = f"positionCaseInsensitiveUTF8({column}, %(value)s) > 0"
+        check = ""
+    elif db_field == "hashtags":
+        lookup = f"{column} = lowerUTF8(%(value)s)"
+        check = f" AND has({table_alias}.{db_field}, %(value)s)"
+    else:
+        lookup = f"{column} = %(value)s"
+        check = ""
+    predicate = (
+        f"({table_alias}.chat_id, {table_alias}.msg_id) IN ("
+        f"SELECT chat_id, msg_id FROM {lookup_table(db_field)} WHERE {lookup}{lookup_window})"
+        f"{check}"
+    )
+    return predicate, params, "lookup"
+
+
+def search_predicate(meta, field, raw_value, method, table_alias="t", lookup_window=""):
+    '''
+        WHERE predicate of a search on field: (sql, params, strategy).
+        Array fields go through their exploded lookup table when it exists
+        (lookup_window restricts it like the outer query), else test each
+        element; integer fields compare exactly and string fields go
+        through text_search_predicate().
+    '''
+    db_field = meta.field_aliases.get(field, field)
     effective_method = method or "ILIKE"
     if field in FORCE_EXACT_FIELDS or db_field == "chat_id":
         effective_method = "IS"
@@ -258,83 +1420,353 @@ def _execute_search_once(
 
     arrayquery = db_field in ("urls", "hashtags")
     numerical = db_field in ("chat_id", "sender_chat_id") or field in FORCE_INTEGER_FIELDS
-    params = {}
-    svalue = "%(value)s"
-    bound_value = raw_value
+    column_sql = f"{table_alias}.{db_field}"
 
     if numerical:
-        svalue = "%(value)i"
         try:
             bound_value = int(raw_value)
         except (TypeError, ValueError):
-            client.disconnect()
             raise ValueError("chat_id must be an integer")
+        if method_lower == "like":
+            return f"{column_sql} LIKE %(value)i", {"value": bound_value}, "scan"
+        if method_lower in ("ilike", "token"):
+            return f"positionCaseInsensitiveUTF8({column_sql}, %(value)i) >0", {"value": bound_value}, "scan"
+        return f"{column_sql} = %(value)i", {"value": bound_value}, "scan"
+
+    if arrayquery and db_field in meta.lookup_tables:
+        return _lookup_predicate(db_field, method_lower, str(raw_value), table_alias, lookup_window)
 
-    table_alias = "t"
     if arrayquery:
-        base_query = f"SELECT {star} FROM {database_name}.{table_name} AS {table_alias} WHERE "
-        if method_lower == "like":
-            base_query += f"arrayExists(u -> u LIKE {svalue}, {table_alias}.{db_field})"
-        elif method_lower == "ilike":
-            base_query += f"arrayExists(u -> positionCaseInsensitiveUTF8(u, {svalue}) > 0 , {table_alias}.{db_field})"
-        else:
-            base_query += f"arrayExists(u -> u = {svalue}, {table_alias}.{db_field})"
-    else:
         if method_lower == "like":
-            base_query = f"SELECT {star} FROM {database_name}.{table_name} AS {table_alias} WHERE {table_alias}.{db_field} LIKE {svalue}"
-        elif method_lower == "ilike":
-            base_query = f"SELECT {star} FROM {database_name}.{table_name} AS {table_alias} WHERE positionCaseInsensitiveUTF8({table_alias}.{db_field}, {svalue}) >0"
-        else:
-            base_query = f"SELECT {star} FROM {database_name}.{table_name} AS {table_alias} WHERE {table_alias}.{db_field} = {svalue}"
+            predicate = f"arrayExists(u -> u LIKE %(value)s, {column_sql})"
+            return predicate, {"value": f"%{raw_value}%"}, "scan"
+        if method_lower in ("ilike", "token"):
+            predicate = f"arrayExists(u -> positionCaseInsensitiveUTF8(u, %(value)s) > 0 , {column_sql})"
+            return predicate, {"value": f"{raw_value}"}, "scan"
+        return f"arrayExists(u -> u = %(value)s, {column_sql})", {"value": f"{raw_value}"}, "scan"
 
-    date_filter_clause = ""
+    if method_lower in ("like", "ilike", "token"):
+        return text_search_predicate(meta, column_sql, db_field, method_lower, raw_value)
+    return f"{column_sql} = %(value)s", {"value": f"{raw_value}"}, "scan"
+
+
+def _execute_search_once(
+    field,
+    raw_value,
+    method,
+    count,
+    *,
+    upper_bound=None,
+    lower_bound=None,
+    fetch_extra=False,
+    after_key=None,
+    client=None,
+    fields=None,
+    snippet=None,
+):
+    meta = current_metadata()
+    start_time = time.time()
+    query_limit = count + 1 if fetch_extra else count
+    table_alias = "t"
+    window_params = {}
+    # Bornes de fenêtre sous forme de gabarits, appliquées à la table et aux tables éclatées
+    window_conditions = []
     if upper_bound:
         normalized = _normalize_iso_datetime(upper_bound)
         try:
             datetime.fromisoformat(normalized)
         except ValueError:
-            client.disconnect()
             raise ValueError("before_date must be ISO 8601 formatted")
-        params["upper_bound"] = normalized
-        date_filter_clause += f" AND {table_alias}.{DATE_COLUMN} < parseDateTimeBestEffort(%(upper_bound)s)"
+        window_params["upper_bound"] = normalized
+        window_conditions.append("{date} < parseDateTimeBestEffort(%(upper_bound)s)")
     if lower_bound:
         normalized_lower = _normalize_iso_datetime(lower_bound)
         try:
             datetime.fromisoformat(normalized_lower)
         except ValueError:
-            client.disconnect()
             raise ValueError("lower bound must be ISO 8601 formatted")
-        params["lower_bound"] = normalized_lower
-        date_filter_clause += f" AND {table_alias}.{DATE_COLUMN} >= parseDateTimeBestEffort(%(lower_bound)s)"
-
-    query = f"{base_query}{date_filter_clause} order by {table_alias}.{DATE_COLUMN} desc limit {query_limit}"
-    params["value"] = (
-        f"%{bound_value}%"
-        if (method_lower == "like" and not numerical)
-        else (f"{bound_value}" if not numerical else bound_value)
+        window_params["lower_bound"] = normalized_lower
+        window_conditions.append("{date} >= parseDateTimeBestEffort(%(lower_bound)s)")
+    if after_key:
+        # Reprise keyset : strictement après la dernière ligne déjà servie
+        key_date, key_chat, key_msg = after_key
+        window_params["key_date"] = _normalize_iso_datetime(str(key_date))
+        window_params["key_chat"] = int(key_chat)
+        window_params["key_msg"] = int(key_msg)
+        window_conditions.append(
+            "({date}, {prefix}chat_id, {prefix}msg_id)"
+            " < (parseDateTimeBestEffort(%(key_date)s), %(key_chat)s, %(key_msg)s)"
+        )
+
+    def window_clause(date, prefix):
+        return "".join(
+            " AND " + condition.format(date=date, prefix=prefix) for condition in window_conditions
+        )
+
+    predicate, params, strategy = search_predicate(
+        meta, field, raw_value, method, table_alias, lookup_window=window_clause("date", "")
+    )
+    params.update(window_params)
+    column_names = tuple(fields or valid_fields)
+    if snippet and "text" in column_names:
+        terms = snippet_terms(meta, field, raw_value, method)
+        case_sensitive = (method or "ILIKE").upper() == "LIKE"
+        params["snippet_term"] = terms[0] if terms else ""
+        projection = snippet_projection(meta, fields, snippet, table_alias, case_sensitive)
+    else:
+        snippet = None
+        projection = projection_clause(meta, fields)
+    base_query = (
+        f"SELECT {projection} FROM {database_name}.{table_name} AS {table_alias} "
+        f"WHERE {predicate}"
+    )
+    date_filter_clause = window_clause(f"{table_alias}.{meta.date_column}", f"{table_alias}.")
+
+    query = (
+        f"{base_query}{date_filter_clause} order by {table_alias}.{meta.date_column} desc, "
+        f"{table_alias}.chat_id desc, {table_alias}.msg_id desc limit {query_limit}"
     )
 
     try:
-        result = client.execute(query, params)
-        column_names = valid_fields
-        results_dict = [dict(zip(column_names, row)) for row in result]
+        result = (client or get_client()).execute(query, params)
         len_result = len(result)
         limit_reached = len_result >= query_limit
-
         if limit_reached:
             has_more = "True"
-            if results_dict:
-                results_dict = results_dict[:-1]
+            result = result[:-1]
         else:
             has_more = "False"
+        if snippet:
+            text_index = column_names.index("text")
+            base = len(column_names)
+            result = [
+                row[:base]
+                + apply_snippet(row[text_index], row[base], row[base + 1], terms, case_sensitive)
+                for row in result
+            ]
+        # Les tuples du driver sont gardés tels quels jusqu'à la mise en forme de la réponse
+        rows = MessageRows(search_result_fields(fields, snippet), result)
 
         timing = f"{float(time.time() - start_time):.5f}"
-        return {"has_more": has_more, "results": results_dict, "timing": timing}
+        return {"has_more": has_more, "results": rows, "timing": timing, "strategy": strategy}
     except Exception as exc:
         print(f"error: {exc}, \n {query}")
         raise
+
+
+def _month_windows(cursor, earliest):
+    """Yield (month_start, upper) windows going back one calendar month at a time."""
+    while cursor >= earliest:
+        month_start = cursor.replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+        yield month_start, cursor
+        cursor = month_start - timedelta(microseconds=1)
+
+
+def plan_search_windows(cursor, earliest):
+    '''
+        Yield contiguous (lower, upper) search windows from cursor down to
+        earliest, newest first.
+
+        When system.parts describes the table, windows are sized to about
+        SEARCH_WINDOW_ROWS rows: dense partitions are sliced, sparse ones
+        are merged and empty gaps are absorbed instead of costing a query.
+        Otherwise fall back to one window per calendar month.
+    '''
+    ranges = current_metadata().partition_ranges
+    if not ranges:
+        yield from _month_windows(cursor, earliest)
+        return
+
+    segments = []
+    for part_lower, part_upper, rows in ranges:
+        if part_lower > cursor:
+            continue
+        part_end = part_upper + timedelta(seconds=1)
+        visible_end = min(cursor, part_end)
+        span = (part_end - part_lower).total_seconds() or 1.0
+        visible_rows = rows * (visible_end - part_lower).total_seconds() / span
+        slices = max(1, math.ceil(visible_rows / SEARCH_WINDOW_ROWS))
+        step = (visible_end - part_lower) / slices
+        for index in range(1, slices + 1):
+            segments.append((visible_end - step * index, visible_rows / slices))
+
+    upper = cursor
+    lower = None
+    pending_rows = 0.0
+    for segment_lower, segment_rows in segments:
+        if lower is not None and pending_rows + segment_rows > SEARCH_WINDOW_ROWS:
+            yield lower, upper
+            upper, lower, pending_rows = lower, None, 0.0
+        segment_lower = min(segment_lower, upper)
+        lower = segment_lower if lower is None else min(lower, segment_lower)
+        pending_rows += segment_rows
+    if lower is not None:
+        yield min(lower, earliest), upper
+
+
+SEARCH_CURSOR_PREFIX = "c1."
+
+
+def is_search_cursor(value):
+    return isinstance(value, str) and value.startswith(SEARCH_CURSOR_PREFIX)
+
+
+def encode_search_cursor(key, window, empty_windows):
+    '''
+        Build the opaque next_cursor token: keyset position (date, chat_id,
+        msg_id) of the last served row, the window it came from and the
+        older windows already proven empty.
+    '''
+    payload = {
+        "k": [key[0], key[1], key[2]],
+        "w": [window[0].isoformat(), window[1].isoformat()],
+        "e": [[lower.isoformat(), upper.isoformat()] for lower, upper in empty_windows],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return SEARCH_CURSOR_PREFIX + base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_search_cursor(token):
+    if not is_search_cursor(token):
+        raise ValueError("Invalid cursor")
+    body = token[len(SEARCH_CURSOR_PREFIX):]
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)))
+        key_date, key_chat, key_msg = payload["k"]
+        return {
+            "key": (str(key_date), int(key_chat), int(key_msg)),
+            "window": tuple(_to_aware_datetime(value) for value in payload["w"]),
+            "empty": [
+                (_to_aware_datetime(lower), _to_aware_datetime(upper))
+                for lower, upper in payload.get("e", [])
+            ],
+        }
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+# Champs toujours renvoyés par une recherche projetée : clé du curseur et des traductions
+SEARCH_KEY_FIELDS = ("id", "chat_id", "date")
+
+
+def search_result_fields(fields, snippet=None):
+    """Field names of the MessageRows returned by a search with this projection and snippet."""
+    names = tuple(fields or valid_fields)
+    if snippet and "text" in names:
+        names += SNIPPET_RESULT_FIELDS
+    return names
+
+
+def _search_windows(cursor, earliest, resume=None):
+    '''
+        Yield (lower, upper, after_key) windows. A resumed search first
+        finishes the cursor window from its keyset position, then continues
+        with the planned windows below it, skipping those proven empty.
+    '''
+    empty = []
+    if resume is not None:
+        lower, upper = resume["window"]
+        empty = resume["empty"]
+        yield lower, upper, resume["key"]
+        cursor = lower
+    for lower, upper in plan_search_windows(cursor, earliest):
+        if lower >= upper:
+            continue
+        if any(empty_lower <= lower and upper <= empty_upper for empty_lower, empty_upper in empty):
+            continue
+        yield lower, upper, None
+
+
+def _search_window(
+    field, raw_value, method, count, lower, upper, after_key, fields=None, snippet=None
+):
+    with clickhouse_pool.connection() as client:
+        return _execute_search_once(
+            field,
+            raw_value,
+            method,
+            count,
+            upper_bound=upper.isoformat(),
+            lower_bound=lower.isoformat(),
+            fetch_extra=True,
+            after_key=after_key,
+            client=client,
+            fields=fields,
+            snippet=snippet,
+        )
+
+
+def _fanout_search(
+    field,
+    raw_value,
+    method,
+    limit,
+    cursor,
+    earliest,
+    fanout,
+    resume=None,
+    fields=None,
+    snippet=None,
+):
+    '''
+        Query up to `fanout` windows at once, each on its own pooled
+        connection, and merge them newest window first. Windows still
+        queued once `limit` rows are collected are cancelled.
+
+        Returns (results, elapsed, last_window, empty_windows) where
+        empty_windows are older windows that completed with no rows.
+    '''
+    start_time = time.time()
+    windows = _search_windows(cursor, earliest, resume)
+    pending = deque()
+    all_results = MessageRows(search_result_fields(fields, snippet), [])
+    last_window = None
+    empty_windows = []
+
+    def submit_next():
+        window = next(windows, None)
+        if window is None:
+            return
+        lower, upper, after_key = window
+        future = _search_executor.submit(
+            _search_window,
+            field,
+            raw_value,
+            method,
+            limit,
+            lower,
+            upper,
+            after_key,
+            fields,
+            snippet,
+        )
+        pending.append(((lower, upper), future))
+
+    try:
+        for _ in range(fanout):
+            submit_next()
+        while pending and len(all_results) < limit:
+            window, future = pending.popleft()
+            chunk_results = future.result()["results"]
+            if chunk_results:
+                all_results.rows.extend(chunk_results.rows)
+                last_window = window
+            if len(all_results) < limit:
+                submit_next()
+    except ValueError:
+        raise
+    except Exception as exc:
+        if should_refresh_schema(exc):
+            metadata_snapshot.wake()
+        raise
     finally:
-        client.disconnect()
+        for window, future in pending:
+            if not future.cancel() and future.done() and future.exception() is None:
+                if not future.result()["results"]:
+                    empty_windows.append(window)
+    return all_results, time.time() - start_time, last_window, empty_windows
 
 
 def perform_search_query(
@@ -344,14 +1776,27 @@ def perform_search_query(
     count,
     *,
     before_date=None,
+    cursor=None,
     fetch_extra=False,
+    fanout=None,
+    fields=None,
+    snippet=None,
 ):
-    earliest = get_earliest_date()
+    meta = current_metadata()
+    # Valide la valeur et indique l'index utilisé avant tout aller-retour
+    _, _, strategy = search_predicate(meta, field, raw_value, method)
+    earliest = meta.earliest_date
     if earliest is None:
-        return {"has_more": "False", "results": [], "timing": "0.00000"}
+        results = MessageRows(search_result_fields(fields, snippet), [])
+        return {"has_more": "False", "results": results, "timing": "0.00000", "strategy": strategy}
+
+    # Les clients qui renvoient next_cursor dans before_date restent compatibles
+    if cursor is None and is_search_cursor(before_date):
+        cursor, before_date = before_date, None
+    resume = decode_search_cursor(cursor) if cursor else None
 
     try:
-        cursor = (
+        start = (
             _to_aware_datetime(before_date)
             if before_date
             else datetime.now(timezone.utc)
@@ -359,92 +1804,335 @@ def perform_search_query(
     except ValueError:
         raise ValueError("before_date must be ISO 8601 formatted")
 
-    if cursor < earliest:
-        cursor = earliest
+    if start < earliest:
+        start = earliest
 
     limit = max(1, count)
-    all_results = []
+    all_results = MessageRows(search_result_fields(fields, snippet), [])
     total_time = 0.0
-    has_more = "False"
-    safety_guard = 0
+    last_window = None
+    empty_windows = []
+    fanout = SEARCH_FANOUT if fanout is None else max(1, int(fanout))
 
-    while len(all_results) < limit and cursor >= earliest:
-        month_start = cursor.replace(
-            day=1, hour=0, minute=0, second=0, microsecond=0
+    if fanout > 1:
+        all_results, total_time, last_window, empty_windows = _fanout_search(
+            field, raw_value, method, limit, start, earliest, fanout, resume, fields, snippet
         )
-        window_upper = cursor
-        window_cursor = window_upper
-        while len(all_results) < limit and window_cursor >= month_start:
-            remaining = limit - len(all_results)
-            try:
-                chunk = _execute_search_once(
-                    field,
-                    raw_value,
-                    method,
-                    remaining,
-                    upper_bound=window_cursor.isoformat(),
-                    lower_bound=month_start.isoformat(),
-                    fetch_extra=True,
-                )
-            except ValueError as exc:
-                raise exc
-            except Exception as exc:
-                if should_refresh_schema(exc) and safety_guard == 0:
-                    ensure_table_metadata(force=True)
-                    safety_guard += 1
-                    continue
-                raise
-
-            try:
-                total_time += float(chunk.get("timing", "0") or 0)
-            except ValueError:
-                pass
-
-            chunk_results = chunk.get("results", [])
-            if not chunk_results:
-                break
+    else:
+        for window_lower, window_upper, after_key in _search_windows(start, earliest, resume):
+            while len(all_results) < limit:
+                remaining = limit - len(all_results)
+                try:
+                    chunk = _execute_search_once(
+                        field,
+                        raw_value,
+                        method,
+                        remaining,
+                        upper_bound=window_upper.isoformat(),
+                        lower_bound=window_lower.isoformat(),
+                        fetch_extra=True,
+                        after_key=after_key,
+                        fields=fields,
+                        snippet=snippet,
+                    )
+                except ValueError as exc:
+                    raise exc
+                except Exception as exc:
+                    # Schéma périmé : le rafraîchissement se fait en arrière-plan
+                    if should_refresh_schema(exc):
+                        metadata_snapshot.wake()
+                    raise
 
-            all_results.extend(chunk_results)
-            last_date_str = chunk_results[-1].get("date")
-            if last_date_str:
-                window_cursor = _to_aware_datetime(last_date_str) - timedelta(
-                    microseconds=1
-                )
-            else:
-                window_cursor = window_cursor - timedelta(seconds=1)
+                try:
+                    total_time += float(chunk.get("timing", "0") or 0)
+                except ValueError:
+                    pass
 
-            if len(all_results) >= limit:
-                has_more = "True"
-                break
+                chunk_results = chunk["results"]
+                if not chunk_results:
+                    break
 
-            if chunk.get("has_more") == "True" and window_cursor >= month_start:
-                continue
-            else:
-                break
+                all_results.rows.extend(chunk_results.rows)
+                last_window = (window_lower, window_upper)
+                after_key = chunk_results.key(-1)
 
-        if len(all_results) >= limit:
-            break
+                if chunk.get("has_more") != "True":
+                    break
 
-        cursor = month_start - timedelta(microseconds=1)
+            if len(all_results) >= limit:
+                break
 
-    if len(all_results) < limit and cursor < earliest:
-        has_more = "False"
-    elif len(all_results) >= limit:
-        has_more = "True"
-    else:
-        has_more = "True" if cursor >= earliest else "False"
+    # Toutes les fenêtres jusqu'à earliest ont été parcourues si la limite n'est pas atteinte
+    has_more = "True" if len(all_results) >= limit else "False"
 
     trimmed_results = all_results[:limit]
     timing = f"{total_time:.5f}"
-    next_cursor = trimmed_results[-1]["date"] if has_more == "True" and trimmed_results else None
+    next_cursor = None
+    if has_more == "True" and trimmed_results:
+        if resume is not None:
+            # Les fenêtres vides plus anciennes déjà connues restent valables
+            empty_windows = [
+                window for window in resume["empty"] if window[1] <= last_window[0]
+            ] + empty_windows
+        next_cursor = encode_search_cursor(
+            trimmed_results.key(-1), last_window, empty_windows
+        )
     return {
         "has_more": has_more,
         "results": trimmed_results,
         "timing": timing,
         "next_cursor": next_cursor,
+        "strategy": strategy,
     }
 
 
+def _cached_json_default(obj):
+    """Stand-in serialization used to size cache entries."""
+    if isinstance(obj, MessageRows):
+        return obj.rows
+    return str(obj)
+
+
+class ResultCache:
+    '''
+        In-process TTL + LRU cache of JSON-able payloads (search results,
+        graphs).
+
+        Each entry may remember the date range its scan covered so that an
+        insert overlapping that range can drop it. The memory cap is
+        enforced on the JSON size of the cached payloads.
+    '''
+
+    def __init__(self, ttl=300.0, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires, size, lower, upper, payload)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_bytes > 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[4]
+
+    def put(self, key, payload, lower, upper):
+        size = len(json.dumps(payload, default=_cached_json_default))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, lower, upper, payload)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_range(self, lower, upper):
+        """Drop every entry whose scanned range overlaps [lower, upper]."""
+        with self._lock:
+            stale = [
+                key
+                for key, (_, _, entry_lower, entry_upper, _) in self._entries.items()
+                if (entry_lower is None or entry_lower <= upper)
+                and (entry_upper is None or entry_upper >= lower)
+            ]
+            for key in stale:
+                self._drop(key)
+        return len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class SharedInvalidations:
+    '''
+        Date ranges invalidated by inserts, published through a sqlite file
+        so that every worker process drops the overlapping entries of its
+        own ResultCache, not only the process that took the insert.
+
+        publish() records a range; pending() returns the ranges published
+        by other processes since the previous call. Rows older than
+        `keep` seconds (the cache TTL) are pruned.
+    '''
+
+    def __init__(self, path, keep=300.0):
+        self.path = path
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        self._last_id = 0
+
+    def _connection(self):
+        # Appelé sous self._lock
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._db_pid = os.getpid()
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS invalidations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    published REAL NOT NULL,
+                    pid INTEGER NOT NULL,
+                    lower TEXT NOT NULL,
+                    upper TEXT NOT NULL
+                )
+                """
+            )
+            self._db.commit()
+            # Le cache de ce process est vide : seules les invalidations à venir comptent
+            row = self._db.execute("SELECT max(id) FROM invalidations").fetchone()
+            self._last_id = row[0] or 0
+        return self._db
+
+    def publish(self, lower, upper):
+        with self._lock:
+            try:
+                db = self._connection()
+                now = time.time()
+                db.execute(
+                    "INSERT INTO invalidations (published, pid, lower, upper) VALUES (?, ?, ?, ?)",
+                    (now, os.getpid(), lower.isoformat(), upper.isoformat()),
+                )
+                db.execute("DELETE FROM invalidations WHERE published < ?", (now - self.keep,))
+                db.commit()
+            except sqlite3.Error as exc:
+                logger.warning("Unable to publish a search cache invalidation: %s", exc)
+
+    def pending(self):
+        with self._lock:
+            try:
+                db = self._connection()
+                rows = db.execute(
+                    "SELECT id, pid, lower, upper FROM invalidations WHERE id > ? ORDER BY id",
+                    (self._last_id,),
+                ).fetchall()
+            except sqlite3.Error as exc:
+                logger.warning("Unable to read search cache invalidations: %s", exc)
+                return []
+            if rows:
+                self._last_id = rows[-1][0]
+        return [
+            (_to_aware_datetime(lower), _to_aware_datetime(upper))
+            for _, pid, lower, upper in rows
+            if pid != os.getpid()
+        ]
+
+
+search_cache = ResultCache(
+    ttl=float(gn_config.get("search_cache_ttl", 300)),
+    max_bytes=int(gn_config.get("search_cache_max_bytes", 64 * 1024 * 1024)),
+)
+search_invalidations = SharedInvalidations(
+    os.path.join(
+        THIS_DIR,
+        gn_config.get("search_cache_invalidations_path") or "search_cache_invalidations.sqlite3",
+    ),
+    keep=search_cache.ttl,
+)
+
+
+graph_cache = ResultCache(
+    ttl=float(gn_config.get("graph_cache_ttl", 600)),
+    max_bytes=int(gn_config.get("graph_cache_max_bytes", 16 * 1024 * 1024)),
+)
+
+
+def cached_search_query(
+    field,
+    raw_value,
+    method,
+    count,
+    *,
+    before_date=None,
+    cursor=None,
+    fetch_extra=False,
+    fields=None,
+    snippet=None,
+):
+    '''
+        perform_search_query() behind search_cache.
+        Returns a fresh dict with "cache" set to "hit" or "miss".
+        fields (see parse_fields) always keeps the keyset fields id, chat_id, date;
+        snippet (see parse_snippet) cuts text around the match (see apply_snippet).
+    '''
+    meta = current_metadata()
+    method = (method or "ILIKE").upper()
+    db_field = meta.field_aliases.get(field, field)
+    if field in FORCE_EXACT_FIELDS or db_field == "chat_id":
+        method = "IS"
+    # lower() et non casefold() : "straße" et "strasse" restent distincts, comme pour ClickHouse
+    value_key = str(raw_value).lower() if method in ("ILIKE", "TOKEN") else str(raw_value)
+    if cursor is None and is_search_cursor(before_date):
+        cursor, before_date = before_date, None
+    upper = None
+    if cursor:
+        upper = _to_aware_datetime(decode_search_cursor(cursor)["key"][0])
+    elif before_date:
+        try:
+            upper = _to_aware_datetime(before_date)
+        except ValueError:
+            raise ValueError("before_date must be ISO 8601 formatted")
+    position = cursor or (upper.isoformat() if upper else None)
+    if fields:
+        fields = tuple(field for field in valid_fields if field in set(fields) | set(SEARCH_KEY_FIELDS))
+    if fields and "text" not in fields:
+        snippet = None
+    key = (db_field, value_key, method, count, position, fields, snippet)
+
+    if search_cache.enabled:
+        # Inserts reçus par les autres workers
+        for lower, upper in search_invalidations.pending():
+            search_cache.invalidate_range(lower, upper)
+        payload = search_cache.get(key)
+        if payload is not None:
+            return attach_translations(dict(payload, cache="hit"), snippet)
+
+    payload = perform_search_query(
+        field,
+        raw_value,
+        method,
+        count,
+        before_date=before_date,
+        cursor=cursor,
+        fetch_extra=fetch_extra,
+        fields=fields,
+        snippet=snippet,
+    )
+    if search_cache.enabled:
+        # Le scan couvre [date du dernier résultat, curseur] ou descend jusqu'au début de la table
+        results = payload["results"]
+        lower = None
+        if payload.get("has_more") == "True" and results:
+            lower = _to_aware_datetime(results.key(-1)[0])
+        search_cache.put(key, payload, lower, upper)
+    return attach_translations(dict(payload, cache="miss"), snippet)
+
+
 def convert_dates_to_iso(data):
     '''
         This function, will convert datetime to utc in isoformat for key date and insest_date in a dict
@@ -494,6 +2182,81 @@ def serialize_datetime(obj):
     raise TypeError("Type non sérialisable")
 
 
+def encode_json(payload):
+    """JSON bytes of payload, through orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=serialize_datetime)
+    return json.dumps(
+        payload, default=serialize_datetime, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def message_response(payload, status=200):
+    """Response for routes returning messages, encoded with encode_json()."""
+    return Response(encode_json(payload), status=status, mimetype="application/json")
+
+
+class MessageRows:
+    '''
+        Message rows kept as the tuples ClickHouse returns, with their field
+        names. shaped() gives one object per row, or for shape=columns one
+        array per field ({"fields": [...], "columns": {...}}), which needs
+        no per-row dict at all.
+    '''
+
+    __slots__ = ("fields", "rows")
+
+    def __init__(self, fields, rows):
+        self.fields = tuple(fields)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        """A slice gives a new MessageRows over the same tuples."""
+        return MessageRows(self.fields, self.rows[index])
+
+    def column(self, field):
+        position = self.fields.index(field)
+        return [row[position] for row in self.rows]
+
+    def key(self, position):
+        """(date, chat_id, id) of a row, the keyset of search cursors."""
+        row = self.rows[position]
+        return tuple(row[self.fields.index(field)] for field in ("date", "chat_id", "id"))
+
+    def with_column(self, field, values):
+        """New MessageRows with one more field; self is left untouched (it may be cached)."""
+        return MessageRows(
+            self.fields + (field,), [row + (value,) for row, value in zip(self.rows, values)]
+        )
+
+    def records(self):
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in self.rows]
+
+    def columns(self):
+        if not self.rows:
+            return {field: [] for field in self.fields}
+        return dict(zip(self.fields, map(list, zip(*self.rows))))
+
+    def shaped(self, shape="rows"):
+        if shape == "columns":
+            return {"fields": list(self.fields), "columns": self.columns()}
+        return self.records()
+
+
+def requested_shape():
+    """"columns" when the caller asked for ?shape=columns, else "rows"."""
+    return "columns" if request.args.get("shape") == "columns" else "rows"
+
+
+def shape_search_payload(payload, shape):
+    """Search payload with its MessageRows results in the requested shape."""
+    return dict(payload, results=payload["results"].shaped(shape))
+
+
 def valid_integer(value):
     '''
     This function check if the integer given in a string is really an integer
@@ -501,7 +2264,7 @@ def valid_integer(value):
     try:
         int(value)
         return True
-    except ValueError:
+    except (TypeError, ValueError):
         return False
 
 
@@ -511,13 +2274,185 @@ def _normalize_language_code(value):
     return str(value).strip().lower()
 
 
+class TranslationCache:
+    '''
+        Two-level cache of LibreTranslate results: an in-memory LRU in front
+        of a sqlite file, both keyed by a hash of (source, target, text).
+
+        The sqlite file survives restarts and is shared by every worker
+        process; each process opens its own connection (reopened after a
+        fork). When the file holds more than max_rows translations, the
+        least recently used tenth is deleted.
+    '''
+
+    def __init__(self, path, memory_entries=10000, max_rows=500000):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> translated text
+        self._db = None
+        self._db_pid = None
+        self._puts_since_trim = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(source_lang, target_lang, text):
+        raw = "\0".join((source_lang, target_lang, text)).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def _connection(self):
+        # Appelé sous self._lock
+        if not self.path or self.max_rows <= 0:
+            return None
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._db_pid = os.getpid()
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS translations (
+                    key TEXT PRIMARY KEY,
+                    translated TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS translations_last_used ON translations(last_used)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key, translated):
+        # Appelé sous self._lock
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = translated
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, source_lang, target_lang, text):
+        key = self.make_key(source_lang, target_lang, text)
+        with self._lock:
+            translated = self._memory.get(key)
+            if translated is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return translated
+            db = None
+            try:
+                db = self._connection()
+                row = None
+                if db is not None:
+                    row = db.execute(
+                        "SELECT translated FROM translations WHERE key = ?", (key,)
+                    ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE translations SET last_used = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+                    db.commit()
+            except sqlite3.Error as exc:
+                logger.warning("Translation cache read failed: %s", exc)
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, source_lang, target_lang, text, translated):
+        key = self.make_key(source_lang, target_lang, text)
+        with self._lock:
+            self._remember(key, translated)
+            try:
+                db = self._connection()
+                if db is None:
+                    return
+                db.execute(
+                    "INSERT OR REPLACE INTO translations (key, translated, last_used) VALUES (?, ?, ?)",
+                    (key, translated, time.time()),
+                )
+                self._puts_since_trim += 1
+                if self._puts_since_trim >= max(1, self.max_rows // 100):
+                    self._puts_since_trim = 0
+                    self._trim(db)
+                db.commit()
+            except sqlite3.Error as exc:
+                logger.warning("Translation cache write failed: %s", exc)
+
+    def _trim(self, db):
+        rows = db.execute("SELECT count() FROM translations").fetchone()[0]
+        if rows <= self.max_rows:
+            return
+        excess = rows - self.max_rows + self.max_rows // 10
+        db.execute(
+            """
+            DELETE FROM translations WHERE key IN (
+                SELECT key FROM translations ORDER BY last_used LIMIT ?
+            )
+            """,
+            (excess,),
+        )
+        self.evictions += excess
+
+    def stats(self):
+        with self._lock:
+            disk_rows = None
+            try:
+                db = self._connection()
+                if db is not None:
+                    disk_rows = db.execute("SELECT count() FROM translations").fetchone()[0]
+            except sqlite3.Error:
+                pass
+            return {
+                "memory_entries": len(self._memory),
+                "disk_rows": disk_rows,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+translation_cache = TranslationCache(
+    os.path.join(THIS_DIR, gn_config.get("translation_cache_path") or "translation_cache.sqlite3"),
+    memory_entries=int(gn_config.get("translation_cache_memory_entries", 10000)),
+    max_rows=int(gn_config.get("translation_cache_max_rows", 500000)),
+)
+
+# Un seul client LibreTranslate pour tout le process
+_libretranslate_client = (
+    LibreTranslateAPI(url=libretranslate_url, api_key=libretranslate_api_key)
+    if LibreTranslateAPI is not None
+    else None
+)
+
+
+def cached_translate(source_lang, target_lang, text):
+    '''
+        _translate_text() behind translation_cache.
+        Returns (translated_text, "hit" | "miss").
+    '''
+    translated = translation_cache.get(source_lang, target_lang, text)
+    if translated is not None:
+        return translated, "hit"
+    translated = _translate_text(source_lang, target_lang, text)
+    translation_cache.put(source_lang, target_lang, text, translated)
+    return translated, "miss"
+
+
 def _translate_text(source_lang, target_lang, text):
     global _logged_libretranslate_fallback
-    if LibreTranslateAPI is not None:
-        translator = LibreTranslateAPI(
-            url=libretranslate_url, api_key=libretranslate_api_key
-        )
-        return translator.translate(text, source_lang, target_lang, timeout=15)
+    if _libretranslate_client is not None:
+        return _libretranslate_client.translate(text, source_lang, target_lang, timeout=15)
 
     if LIBRETRANSLATE_IMPORT_ERROR is not None and not _logged_libretranslate_fallback:
         logger.warning(
@@ -555,34 +2490,425 @@ def _translate_text(source_lang, target_lang, text):
     return translated_text
 
 
-@app.route("/", methods=["GET"])
-def home():
-    """Serve a small landing page embedding the Telegram search UI."""
-    message_count_text = "loading…"
-    chat_room_count_text = "loading…"
-    client = None
+class LibreTranslatePool:
+    '''
+        Keep-alive HTTP connections to LibreTranslate for batch translation.
+        At most `size` requests are in flight at once; idle connections are
+        reused and a connection dropped by the server is retried once.
+    '''
+
+    def __init__(self, url, api_key=None, size=4, timeout=15.0):
+        parsed = urlsplit(url)
+        self._connection_class = HTTPSConnection if parsed.scheme == "https" else HTTPConnection
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._path = parsed.path.rstrip("/") + "/translate"
+        self._api_key = api_key
+        self._timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+
+    def _checkout(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Connexions héritées d'un fork : on repart de zéro
+                self._idle = []
+                self._pid = os.getpid()
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connection_class(self._host, self._port, timeout=self._timeout), False
+
+    def _checkin(self, connection):
+        with self._lock:
+            self._idle.append(connection)
+
+    def translate(self, text, source_lang, target_lang):
+        payload = {"q": text, "source": source_lang, "target": target_lang, "format": "text"}
+        if self._api_key:
+            payload["api_key"] = self._api_key
+        body = urlencode(payload).encode("utf-8")
+        headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        with self._slots:
+            connection, reused = self._checkout()
+            try:
+                try:
+                    connection.request("POST", self._path, body=body, headers=headers)
+                    response = connection.getresponse()
+                except (ConnectionError, HTTPException):
+                    if not reused:
+                        raise
+                    connection.close()
+                    connection = self._connection_class(self._host, self._port, timeout=self._timeout)
+                    connection.request("POST", self._path, body=body, headers=headers)
+                    response = connection.getresponse()
+                raw = response.read().decode("utf-8", errors="replace")
+            except BaseException:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._checkin(connection)
+
+        try:
+            parsed = json.loads(raw)
+        except ValueError:
+            parsed = None
+        if response.status >= 400:
+            upstream = parsed.get("error") if isinstance(parsed, dict) else None
+            raise ValueError(f"LibreTranslate HTTP {response.status}: {upstream or response.reason}")
+        translated_text = parsed.get("translatedText") if isinstance(parsed, dict) else None
+        if translated_text is None:
+            raise ValueError("Unexpected LibreTranslate response")
+        return translated_text
+
+
+TRANSLATE_BATCH_CONCURRENCY = max(1, int(gn_config.get("translate_batch_concurrency", 4)))
+TRANSLATE_BATCH_MAX_ITEMS = int(gn_config.get("translate_batch_max_items", 500))
+libretranslate_pool = LibreTranslatePool(
+    libretranslate_url,
+    api_key=libretranslate_api_key,
+    size=TRANSLATE_BATCH_CONCURRENCY,
+)
+_translate_executor = ThreadPoolExecutor(
+    max_workers=TRANSLATE_BATCH_CONCURRENCY, thread_name_prefix="translate"
+)
+
+
+def _pooled_translate(source_lang, target_lang, text):
+    translated = translation_cache.get(source_lang, target_lang, text)
+    if translated is not None:
+        return translated, "hit"
+    translated = libretranslate_pool.translate(text, source_lang, target_lang)
+    translation_cache.put(source_lang, target_lang, text, translated)
+    return translated, "miss"
+
+
+def _message_languages(keys):
+    '''
+        lang column of the given (chat_id, msg_id) pairs, in one query.
+    '''
+    if not keys:
+        return {}
+    rows = get_client().execute(
+        f"SELECT chat_id, msg_id, lang FROM {database_name}.{table_name} WHERE (chat_id, msg_id) IN %(keys)s",
+        {"keys": tuple(keys)},
+    )
+    return {(chat_id, msg_id): _normalize_language_code(lang) for chat_id, msg_id, lang in rows}
+
+
+def translate_batch_items(items, target_lang):
+    '''
+        Translate a list of {"id", "text", "source"?, "chat_id"?, "msg_id"?}
+        items into target_lang. Identical (source, text) pairs are translated
+        once. Items without source fall back to the lang column of their
+        message, then to "auto". Returns a dict id -> result or error;
+        items without an id are reported under "#<index>" (position in
+        items), which cannot collide with a stringified id.
+    '''
+    results = {}
+    pending = []
+    lookups = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or item.get("id") is None:
+            results[f"#{index}"] = {"error": "Missing id"}
+            continue
+        item_id = str(item["id"])
+        text = item.get("text")
+        if not isinstance(text, str) or not text.strip():
+            results[item_id] = {"error": "Missing or empty text"}
+            continue
+        source_lang = _normalize_language_code(item.get("source"))
+        key = None
+        if not source_lang and valid_integer(item.get("chat_id")) and valid_integer(item.get("msg_id")):
+            key = (int(item["chat_id"]), int(item["msg_id"]))
+            lookups.add(key)
+        pending.append((item_id, text, source_lang, key))
+
+    languages = _message_languages(lookups)
+    groups = defaultdict(list)
+    for item_id, text, source_lang, key in pending:
+        source_lang = source_lang or languages.get(key) or "auto"
+        if source_lang == target_lang:
+            results[item_id] = {"source": source_lang, "translated_text": text, "cache": "hit"}
+            continue
+        groups[(source_lang, text)].append(item_id)
+
+    futures = {
+        _translate_executor.submit(_pooled_translate, source_lang, target_lang, text): (source_lang, text)
+        for source_lang, text in groups
+    }
+    for future, (source_lang, text) in futures.items():
+        try:
+            translated, cache_status = future.result()
+            result = {"source": source_lang, "translated_text": translated, "cache": cache_status}
+        except Exception as exc:
+            logger.warning("LibreTranslate batch item failed: %s", exc)
+            result = {"source": source_lang, "error": str(exc)}
+        for item_id in groups[(source_lang, text)]:
+            results[item_id] = result
+    return results
+
+
+class TranslationPipeline:
+    '''
+        Background translation of freshly inserted messages.
+
+        submit() keeps the records whose lang is in `languages` and queues
+        them; `workers` daemon threads translate them through
+        libretranslate_pool (and the translation cache) and append the
+        results to TRANSLATIONS_TABLE, keyed by (chat_id, msg_id), in
+        batches of flush_rows or once the oldest pending translation is
+        flush_interval seconds old. When the queue is full, records are
+        dropped and counted: they can still be translated on demand through
+        /translate. close() drains the queue on exit.
+    '''
+
+    def __init__(self, languages, target_lang="en", workers=2, max_queue=10000,
+                 flush_rows=500, flush_interval=5.0):
+        self.languages = {_normalize_language_code(lang) for lang in languages}
+        self.target_lang = _normalize_language_code(target_lang)
+        self.workers = max(1, workers)
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = flush_interval
+        self.max_queue = max(1, max_queue)
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._oldest = None
+        self._threads = []
+        self._pid = None
+        self._closing = threading.Event()
+        self._table_ready = False
+        self.translated = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+                return
+            if self._pid != os.getpid():
+                # Après un fork, la file et les traductions en attente sont celles du parent
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._pending, self._oldest = [], None
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"translate-ingest-{index}", daemon=True)
+                for index in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def submit(self, records):
+        """Queue the translatable records (positional rows) of an insert."""
+        lang_index = RECORD_POSITIONS["lang"]
+        text_index = RECORD_POSITIONS["text"]
+        chat_index = RECORD_POSITIONS["chat_id"]
+        queued = 0
+        for record in records:
+            source_lang = _normalize_language_code(record[lang_index])
+            text = record[text_index]
+            if source_lang not in self.languages or source_lang == self.target_lang:
+                continue
+            if not isinstance(text, str) or not text.strip():
+                continue
+            if self._closing.is_set():
+                self.dropped += 1
+                continue
+            if not queued:
+                self._start()
+            try:
+                self._queue.put_nowait((record[chat_index], record[0], source_lang, text))
+                queued += 1
+            except queue.Full:
+                self.dropped += 1
+        return queued
+
+    def _flush_due_in(self):
+        """Seconds before the oldest pending translation must be written."""
+        with self._lock:
+            if self._oldest is None:
+                return self.flush_interval
+            return max(0.0, self._oldest + self.flush_interval - time.monotonic())
+
+    def _run(self):
+        while True:
+            try:
+                chat_id, msg_id, source_lang, text = self._queue.get(timeout=self._flush_due_in())
+            except queue.Empty:
+                self._flush()
+                if self._closing.is_set():
+                    return
+                continue
+            try:
+                translated, _ = _pooled_translate(source_lang, self.target_lang, text)
+            except Exception as exc:
+                self.failed += 1
+                logger.warning("Ingest translation of %s/%s failed: %s", chat_id, msg_id, exc)
+                translated = None
+            with self._lock:
+                if translated is not None:
+                    self._pending.append(
+                        (chat_id, msg_id, source_lang, self.target_lang, translated)
+                    )
+                    if self._oldest is None:
+                        self._oldest = time.monotonic()
+                due = self._pending and (
+                    len(self._pending) >= self.flush_rows
+                    or time.monotonic() - self._oldest >= self.flush_interval
+                )
+            if due:
+                self._flush()
+
+    def close(self, timeout=30):
+        """Stop accepting records, translate what is queued and write it (bounded by timeout)."""
+        self._closing.set()
+        if self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._flush()
+
+    def _ensure_table(self, client):
+        if self._table_ready:
+            return
+        client.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {database_name}.{TRANSLATIONS_TABLE} (
+                chat_id Int64,
+                msg_id Int64,
+                source_lang LowCardinality(String),
+                target_lang LowCardinality(String),
+                translated_text String,
+                translated_at DateTime DEFAULT now()
+            ) ENGINE = ReplacingMergeTree(translated_at) ORDER BY (chat_id, msg_id, target_lang)
+            """
+        )
+        self._table_ready = True
+        if not current_metadata().translations_ready:
+            metadata_snapshot.wake()
+
+    def _flush(self):
+        with self._lock:
+            rows, self._pending, self._oldest = self._pending, [], None
+        if not rows:
+            return
+        try:
+            with clickhouse_pool.connection() as client:
+                self._ensure_table(client)
+                client.execute(
+                    f"INSERT INTO {database_name}.{TRANSLATIONS_TABLE} "
+                    "(chat_id, msg_id, source_lang, target_lang, translated_text) VALUES",
+                    rows,
+                )
+            self.translated += len(rows)
+        except Exception as exc:
+            self.failed += len(rows)
+            logger.error("Failed to write %d ingest translations: %s", len(rows), exc)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "translated": self.translated,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+translation_pipeline = None
+TRANSLATION_TARGET = _normalize_language_code(gn_config.get("translate_ingest_target") or "en")
+if gn_config.get("translate_ingest_enabled", False):
+    translation_pipeline = TranslationPipeline(
+        gn_config.get("translate_ingest_languages") or [],
+        target_lang=TRANSLATION_TARGET,
+        workers=int(gn_config.get("translate_ingest_workers", 2)),
+        max_queue=int(gn_config.get("translate_ingest_max_queue", 10000)),
+        flush_rows=int(gn_config.get("translate_ingest_flush_rows", 500)),
+        flush_interval=float(gn_config.get("translate_ingest_flush_interval", 5)),
+    )
+    atexit.register(translation_pipeline.close)
+
+
+def read_ingest_translations(keys, with_text=True):
+    '''
+        {(chat_id, msg_id): translated text} of the ingest-time translations
+        into TRANSLATION_TARGET of the given keys (values are None without
+        with_text). Empty when they cannot be read.
+    '''
+    if not current_metadata().translations_ready or not keys:
+        return {}
+    value = "argMax(translated_text, translated_at)" if with_text else "NULL"
     try:
-        client = Client(host=clickhouse_host, port=clickhouse_port)
-        msg_result = client.execute(f"SELECT count() FROM {database_name}.{table_name}")
-        room_result = client.execute(
-            f"SELECT countDistinct(chat_id) FROM {database_name}.{table_name}"
+        rows = get_client().execute(
+            f"""
+            SELECT chat_id, msg_id, {value}
+            FROM {database_name}.{TRANSLATIONS_TABLE}
+            WHERE target_lang = %(target)s AND (chat_id, msg_id) IN %(keys)s
+            GROUP BY chat_id, msg_id
+            """,
+            {"target": TRANSLATION_TARGET, "keys": tuple(keys)},
         )
-        if msg_result and msg_result[0]:
-            message_count_text = f"{msg_result[0][0]:,}".replace(",", " ")
-        if room_result and room_result[0]:
-            chat_room_count_text = f"{room_result[0][0]:,}".replace(",", " ")
     except Exception as exc:
-        logger.warning("Failed to fetch message count for landing page: %s", exc)
-        message_count_text = "unavailable"
-        chat_room_count_text = "unavailable"
-    finally:
-        if client:
-            try:
-                client.disconnect()
-            except Exception:
-                pass
+        logger.warning("Unable to read ingest translations: %s", exc)
+        return {}
+    return {(chat_id, msg_id): text for chat_id, msg_id, text in rows}
+
+
+def attach_translations(payload, snippet=None):
+    '''
+        Add "translation" to the search results that have an ingest-time
+        translation into TRANSLATION_TARGET. In snippet mode only
+        "translation_available" is set: the translation comes with the full
+        text from /get_msg. Returns a new payload; cached MessageRows are
+        never modified in place.
+    '''
+    results = payload["results"]
+    if not results:
+        return payload
+    keys = list(zip(results.column("chat_id"), results.column("id")))
+    found = read_ingest_translations(set(keys), with_text=not snippet)
+    if not found:
+        return payload
+    if snippet:
+        values = [True if key in found else None for key in keys]
+        return dict(payload, results=results.with_column("translation_available", values))
+    values = [found.get(key) for key in keys]
+    return dict(payload, results=results.with_column("translation", values))
+
+
+def load_landing_counts():
+    '''
+        Message and chat room totals shown on the landing page.
+        The message total is summed from the active parts in system.parts
+        (no scan), falling back to count().
+    '''
+    with clickhouse_pool.connection() as client:
+        rows = client.execute(
+            "SELECT sum(rows) FROM system.parts WHERE active AND database = %(db)s AND table = %(table)s",
+            {"db": database_name, "table": table_name},
+        )
+        messages = rows[0][0] if rows else 0
+        if not messages:
+            messages = client.execute(f"SELECT count() FROM {database_name}.{table_name}")[0][0]
+        rooms = client.execute(
+            f"SELECT countDistinct(chat_id) FROM {database_name}.{table_name}"
+        )[0][0]
+    return {"messages": messages, "rooms": rooms}
+
+
+landing_counts_snapshot = PeriodicSnapshot(
+    "landing-counts", load_landing_counts, STATS_REFRESH_INTERVAL
+)
 
-    html_page = """<!DOCTYPE html>
+
+HOME_PAGE_TEMPLATE = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="utf-8" />
@@ -687,6 +3013,19 @@ def home():
             white-space: pre-wrap;
             word-break: break-word;
         }
+        .card mark {
+            background: #9e6a03;
+            color: #fff;
+            border-radius: 3px;
+        }
+        .expand-btn {
+            background: none;
+            border: 1px solid #30363d;
+            border-radius: 6px;
+            color: #79c0ff;
+            padding: 0.3rem 0.8rem;
+            cursor: pointer;
+        }
         .tagline {
             font-size: 0.9rem;
             margin-top: 0.2rem;
@@ -845,6 +3184,7 @@ def home():
                     <select id="method" name="method" required>
                         <option value="LIKE">Contains</option>
                         <option value="ILIKE" selected>Insensitive Contains</option>
+                        <option value="TOKEN">Whole words</option>
                         <option value="IS">Exact</option>
                     </select>
                 </div>
@@ -884,6 +3224,8 @@ def home():
         nextCursor: null,
         totalLoaded: 0
     };
+    // Taille des extraits demandés ; le texte complet est chargé à l'ouverture d'une carte
+    const SNIPPET_CHARS = 400;
 
     function escapeHtml(text) {
         return text.replace(/[&<>"'`=\\/]/g, function (char) {
@@ -942,6 +3284,66 @@ def home():
             document.getElementById('modalBackdrop').classList.remove('visible');
         }
     });
+    function highlightText(text, matches) {
+        // Les offsets sont en caractères Unicode, pas en unités UTF-16
+        const chars = Array.from(text);
+        let html = '';
+        let position = 0;
+        (matches || []).forEach(([offset, length]) => {
+            if (offset < position) {
+                return;
+            }
+            html += escapeHtml(chars.slice(position, offset).join(''));
+            html += '<mark>' + escapeHtml(chars.slice(offset, offset + length).join('')) + '</mark>';
+            position = offset + length;
+        });
+        html += escapeHtml(chars.slice(position).join(''));
+        return html.replace(/\\n/g, '<br>');
+    }
+    function renderSnippet(result) {
+        if (!result.text) {
+            return '<em>No text</em>';
+        }
+        let html = highlightText(result.text, result.matches);
+        if (result.snippet_start > 0) {
+            html = '… ' + html;
+        }
+        if (result.truncated && result.snippet_start + Array.from(result.text).length < result.text_length) {
+            html += ' …';
+        }
+        return html;
+    }
+    async function expandCard(button) {
+        const card = button.closest('.card');
+        button.disabled = true;
+        try {
+            const params = new URLSearchParams({
+                msg_id: button.dataset.msg,
+                channel_id: button.dataset.chat,
+                fields: 'text'
+            });
+            const response = await fetch(`/get_msg?${params}`);
+            if (!response.ok) {
+                throw new Error('Fetch failed');
+            }
+            const rows = await response.json();
+            const message = Array.isArray(rows) && rows.length ? rows[0] : {};
+            const pre = card.querySelector('pre');
+            pre.innerHTML = escapeHtml(message.text || '').replace(/\\n/g, '<br>');
+            if (message.translation) {
+                pre.insertAdjacentHTML('afterend', `<p class="note"><strong>Translation:</strong> ${escapeHtml(message.translation).replace(/\\n/g, '<br>')}</p>`);
+            }
+            button.remove();
+        } catch (error) {
+            button.disabled = false;
+            button.textContent = 'Could not load the full message, retry';
+        }
+    }
+    document.addEventListener('click', (event) => {
+        if (event.target.classList.contains('expand-btn')) {
+            expandCard(event.target);
+        }
+    });
     function renderResults(data, append = false) {
         const resultsContainer = document.getElementById('results');
         if (!append) {
@@ -956,7 +3358,10 @@ def home():
         data.results.forEach(result => {
             const card = document.createElement('article');
             card.className = 'card';
-            const text = result.text ? escapeHtml(result.text).replace(/\\n/g, '<br>') : '<em>No text</em>';
+            const text = renderSnippet(result);
+            const expandButton = result.truncated || result.translation_available
+                ? `<button type="button" class="expand-btn" data-chat="${escapeHtml(String(result.chat_id))}" data-msg="${escapeHtml(String(result.id))}">Show full message</button>`
+                : '';
             const hashtags = Array.isArray(result.hashtags) ? result.hashtags.filter(Boolean).join(' ') : result.hashtags || '';
             const telegramLink = result.chat_name && result.id
                 ? `<a target="_blank" rel="noopener" href="https://t.me/${encodeURIComponent(result.chat_name)}/${encodeURIComponent(result.id)}">open in Telegram</a>`
@@ -968,6 +3373,7 @@ def home():
                 <p><strong>${escapeHtml(String(result.username || 'anonymous'))}</strong> (${escapeHtml(String(result.sender_chat_id || 'unknown'))})</p>
                 ${result.title ? `<p><strong>${escapeHtml(String(result.title))}</strong></p>` : ''}
                 <pre>${text}</pre>
+                ${expandButton}
                 ${result.msg_fwd == 1 ? `<p><strong>Forwarded from:</strong> ${escapeHtml(String(result.msg_fwd_title || ''))} (${escapeHtml(String(result.msg_fwd_username || ''))})</p>` : ''}
                 ${result.document_present == 1 ? `<p><span aria-hidden="true">📄</span> ${escapeHtml(String(result.document_name || ''))} (${formatBytes(Number(result.document_size) || 0)}, ${escapeHtml(String(result.document_type || 'unknown'))})</p>` : ''}
                 ${hashtags ? `<p><strong>${escapeHtml(hashtags)}</strong></p>` : ''}
@@ -1002,6 +3408,7 @@ def home():
     function resetStateForNewSearch(payload) {
         searchState.basePayload = { ...payload };
         delete searchState.basePayload.before_date;
+        delete searchState.basePayload.cursor;
         searchState.nextCursor = null;
         searchState.totalLoaded = 0;
         document.getElementById('resultsSummary').textContent = '';
@@ -1057,7 +3464,8 @@ def home():
             field: document.getElementById('field').value,
             method: document.getElementById('method').value,
             value: document.getElementById('value').value.trim(),
-            count: requestedCount
+            count: requestedCount,
+            snippet: SNIPPET_CHARS
         };
     }
     document.addEventListener('DOMContentLoaded', () => {
@@ -1088,7 +3496,7 @@ def home():
             loadMoreBtn.textContent = 'Loading…';
             const payload = {
                 ...searchState.basePayload,
-                before_date: searchState.nextCursor
+                cursor: searchState.nextCursor
             };
             await performSearch(payload, { append: true });
             loadMoreBtn.disabled = false;
@@ -1098,9 +3506,56 @@ def home():
     </script>
 </body>
 </html>"""
-    html_page = html_page.replace("__MESSAGE_COUNT__", message_count_text)
-    html_page = html_page.replace("__CHATROOM_COUNT__", chat_room_count_text)
-    return Response(html_page, mimetype="text/html")
+
+# Découpé une fois pour toutes autour des compteurs
+_HOME_PAGE_HEAD, _rest = HOME_PAGE_TEMPLATE.split("__MESSAGE_COUNT__", 1)
+_HOME_PAGE_MIDDLE, _HOME_PAGE_TAIL = _rest.split("__CHATROOM_COUNT__", 1)
+del _rest
+_HOME_PAGE_STARTED = time.time()
+_home_page_lock = threading.Lock()
+_home_page = None  # (taken_at, body, gzipped body, etag, last_modified)
+
+
+def render_home_page():
+    '''
+        Landing page for the current landing_counts_snapshot, rendered and
+        gzipped once per snapshot.
+    '''
+    global _home_page
+    counts, taken_at = landing_counts_snapshot.peek()
+    with _home_page_lock:
+        if _home_page is not None and _home_page[0] == taken_at:
+            return _home_page
+        message_count_text = chat_room_count_text = "loading…"
+        if counts is not None:
+            message_count_text = f"{counts['messages']:,}".replace(",", " ")
+            chat_room_count_text = f"{counts['rooms']:,}".replace(",", " ")
+        body = (
+            _HOME_PAGE_HEAD + message_count_text + _HOME_PAGE_MIDDLE + chat_room_count_text + _HOME_PAGE_TAIL
+        ).encode("utf-8")
+        _home_page = (
+            taken_at,
+            body,
+            gzip.compress(body, compresslevel=6),
+            hashlib.sha1(body).hexdigest(),
+            datetime.fromtimestamp(int(taken_at or _HOME_PAGE_STARTED), timezone.utc),
+        )
+        return _home_page
+
+
+@app.route("/", methods=["GET"])
+def home():
+    """Serve a small landing page embedding the Telegram search UI."""
+    _, body, gzipped, etag, last_modified = render_home_page()
+    use_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+    response = Response(gzipped if use_gzip else body, mimetype="text/html")
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "no-cache"
+    response.set_etag(etag + ("-gz" if use_gzip else ""))
+    response.last_modified = last_modified
+    return response.make_conditional(request)
 
 
 @app.route("/translate", methods=["GET"])
@@ -1135,7 +3590,7 @@ def translate_text():
         )
 
     try:
-        translated_text = _translate_text(source_lang, target_lang, text)
+        translated_text, cache_status = cached_translate(source_lang, target_lang, text)
     except HTTPError as exc:
         logger.warning("LibreTranslate HTTP error: %s", exc)
         error_body = None
@@ -1184,6 +3639,34 @@ def translate_text():
             "translated_text": translated_text,
             "provider": "LibreTranslate",
             "service_url": libretranslate_url,
+            "cache": cache_status,
+        }
+    )
+
+
+@app.route("/translate_batch", methods=["POST"])
+def translate_batch():
+    """
+    Translate many items in one call.
+    Body: {"target": "en", "items": [{"id": ..., "text": ..., "source": ...,
+    "chat_id": ..., "msg_id": ...}]}; results are keyed by id, items
+    without an id under "#<index>".
+    """
+    payload = request.get_json(silent=True) or {}
+    target_lang = _normalize_language_code(payload.get("target") or payload.get("LDST"))
+    items = payload.get("items")
+    if not target_lang or not isinstance(items, list):
+        return jsonify({"error": "Missing target or items"}), 400
+    if len(items) > TRANSLATE_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Too many items (max {TRANSLATE_BATCH_MAX_ITEMS})"}), 413
+
+    results = translate_batch_items(items, target_lang)
+    return jsonify(
+        {
+            "target": target_lang,
+            "results": results,
+            "provider": "LibreTranslate",
+            "service_url": libretranslate_url,
         }
     )
 
@@ -1216,6 +3699,7 @@ def search_go_telegrams():
 
     limited_count = min(requested_count, 100)
     before_date = payload.get("before_date")
+    cursor = payload.get("cursor")
     query_params_dict = {
         "field": field,
         "value": value,
@@ -1224,6 +3708,15 @@ def search_go_telegrams():
     }
     if before_date:
         query_params_dict["before_date"] = before_date
+    if cursor:
+        query_params_dict["cursor"] = cursor
+    if payload.get("shape"):
+        query_params_dict["shape"] = payload["shape"]
+    if payload.get("fields"):
+        fields = payload["fields"]
+        query_params_dict["fields"] = fields if isinstance(fields, str) else ",".join(map(str, fields))
+    if payload.get("snippet"):
+        query_params_dict["snippet"] = payload["snippet"]
     query_params = urlencode(query_params_dict)
 
     with app.test_request_context(f"/search_latest?{query_params}", method="GET"):
@@ -1245,6 +3738,7 @@ def search_latest():
     method = request.args.get("method", "ILIKE")
     count_param = request.args.get("count")
     before_date = request.args.get("before_date")
+    cursor = request.args.get("cursor")
 
     if not field or not value:
         return jsonify({"error": "Missing field or value parameter"}), 400
@@ -1263,8 +3757,18 @@ def search_latest():
         method = "IS"
 
     try:
-        payload = perform_search_query(
-            field, value, method, limit, before_date=before_date, fetch_extra=True
+        fields = parse_fields(current_metadata(), request.args.get("fields"))
+        snippet = parse_snippet(request.args.get("snippet"))
+        payload = cached_search_query(
+            field,
+            value,
+            method,
+            limit,
+            before_date=before_date,
+            cursor=cursor,
+            fetch_extra=True,
+            fields=fields,
+            snippet=snippet,
         )
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
@@ -1272,7 +3776,7 @@ def search_latest():
         print(f"error: {exc}")
         return jsonify({"error": str(exc)}), 500
 
-    return jsonify(payload)
+    return message_response(shape_search_payload(payload, requested_shape()))
 
 
 # Route pour les requêtes de recherche
@@ -1283,6 +3787,7 @@ def search():
     /telegramsearch/search_telegrams/
     and allows searching into the database.
     """
+    meta = current_metadata()
     field = request.args.get("field")
     raw_value = request.args.get("value")
     method = request.args.get("method")
@@ -1298,7 +3803,7 @@ def search():
     if not field or not raw_value:
         return jsonify({"error": "Missing field or value parameter"}), 400
 
-    if field not in queryable_fields:
+    if field not in meta.queryable_fields:
         return jsonify({"error": "Invalid field parameter"}), 400
 
     if not method:
@@ -1307,9 +3812,13 @@ def search():
         method = "IS"
 
     try:
-        result = perform_search_query(field, raw_value, method, count)
+        fields = parse_fields(meta, request.args.get("fields"))
+        snippet = parse_snippet(request.args.get("snippet"))
+        result = cached_search_query(
+            field, raw_value, method, count, fields=fields, snippet=snippet
+        )
         result.pop("next_cursor", None)
-        return jsonify(result)
+        return message_response(shape_search_payload(result, requested_shape()))
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
     except Exception as exc:
@@ -1320,10 +3829,11 @@ def search():
 @app.route("/search_channel_text", methods=["GET"])
 def search_channel_text():
     """
-    Search text inside a single channel with LIKE/ILIKE on the text field.
+    Search text inside a single channel with LIKE/ILIKE/TOKEN on the text field.
     """
+    meta = current_metadata()
     start_time = time.time()
-    client = Client(host=clickhouse_host, port=clickhouse_port)
+    client = get_client()
 
     chat_id = request.args.get("chat_id")
     text = request.args.get("text")
@@ -1344,50 +3854,46 @@ def search_channel_text():
         return jsonify({"error": "Invalid Count"}), 400
 
     method = method.lower()
-    if method not in ("like", "ilike"):
+    if method not in ("like", "ilike", "token"):
         return jsonify({"error": "Invalid method parameter"}), 400
 
-    if method == 'like':
-        query = f"""SELECT {star}
-                    FROM {database_name}.{table_name}
-                    WHERE chat_id = %(chat_id)s AND text LIKE %(value)s
-                    order by {DATE_COLUMN} desc limit {local_count}"""
-        params = {"chat_id": int(chat_id), "value": f"%{text}%"}
-    else:
-        query = f"""SELECT {star}
-                    FROM {database_name}.{table_name}
-                    WHERE chat_id = %(chat_id)s
-                      AND positionCaseInsensitiveUTF8(text, %(value)s) > 0
-                    order by {DATE_COLUMN} desc limit {local_count}"""
-        params = {"chat_id": int(chat_id), "value": f"{text}"}
+    try:
+        predicate, params, strategy = text_search_predicate(meta, "text", "text", method, text)
+        fields = parse_fields(meta, request.args.get("fields"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    query = f"""SELECT {projection_clause(meta, fields)}
+                FROM {database_name}.{table_name}
+                WHERE chat_id = %(chat_id)s
+                  AND {predicate}
+                order by {meta.date_column} desc limit {local_count}"""
+    params["chat_id"] = int(chat_id)
 
     try:
         result = client.execute(query, params)
-        column_names = valid_fields
-        results_dict = [dict(zip(column_names, row)) for row in result]
         len_result = len(result)
 
         if len_result >= local_count:
             has_more = "True"
-            results_dict = results_dict[:-1]
+            result = result[:-1]
         else:
             has_more = "False"
 
         timing = float(time.time() - start_time)
         timing = f"{timing:.5f}"
-        del client
-        results = {"has_more": has_more, "results": results_dict, "timing": timing}
-        return jsonify(results)
+        results_rows = MessageRows(fields or valid_fields, result).shaped(requested_shape())
+        results = {"has_more": has_more, "results": results_rows, "timing": timing, "strategy": strategy}
+        return message_response(results)
     except Exception as e:
         print(f"error: {e}, \n {query}")
-        del client
         return jsonify({"error": str(e)}), 500
 
 # Route pour avoir plein de messages
 @app.route("/get_bulk_msgs", methods=["POST"])
 def get_bulk_msg():
+    meta = current_metadata()
     # Connect to clickhouse
-    client = Client(host=clickhouse_host, port=clickhouse_port)
+    client = get_client()
 
     msgs = ", ".join(
         f"({chat_id},{msg_id})" for chat_id, msg_id in json.loads(request.get_json())
@@ -1408,20 +3914,29 @@ def get_bulk_msg():
     ]
 
     query_column = ", ".join(column_names)
+    key_field = "msg_id"
+    try:
+        fields = parse_fields(meta, request.args.get("fields"), required=("id", "chat_id"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if fields:
+        column_names, query_column, key_field = fields, projection_clause(meta, fields), "id"
     query = f"SELECT {query_column} FROM {database_name}.{table_name} WHERE (chat_id, msg_id) in ({msgs})"
     result = client.execute(query, {})
-    del client
 
-    results_dict = [dict(zip(column_names, row)) for row in result]
+    rows = MessageRows(column_names, result)
+    if requested_shape() == "columns":
+        return message_response(rows.shaped("columns"))
     hash_return = {}
-    for item in results_dict:
-        hash_return[f"{item.get('chat_id')}-{item.get('msg_id')}"] = item
-    return jsonify(hash_return)
+    for item in rows.records():
+        hash_return[f"{item.get('chat_id')}-{item.get(key_field)}"] = item
+    return message_response(hash_return)
 
 
 # Route pour récupérer un message
 @app.route("/get_msg", methods=["GET"])
 def get_msg():
+    meta = current_metadata()
     msg_id = request.args.get("msg_id")
     chat_id = request.args.get("channel_id")
 
@@ -1429,28 +3944,33 @@ def get_msg():
         return jsonify({})
 
     try:
-        client = Client(host=clickhouse_host, port=clickhouse_port)
+        fields = parse_fields(meta, request.args.get("fields"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    try:
+        client = get_client()
 
         query = f"""
-            SELECT {star} 
+            SELECT {projection_clause(meta, fields)}
             FROM {database_name}.{table_name}
             WHERE msg_id = %(msg_id)s AND chat_id = %(chat_id)s
             LIMIT 1
         """
         result = client.execute(query, {"msg_id": int(msg_id), "chat_id": int(chat_id)})
-        column_names = valid_fields  # Make sure this matches the SELECT columns order
-        results_dict = [dict(zip(column_names, row)) for row in result]
-
-        return jsonify(results_dict)
+        # valid_fields suit l'ordre des colonnes de star
+        rows = MessageRows(fields or valid_fields, result)
+        if result and (not fields or "text" in fields):
+            key = (int(chat_id), int(msg_id))
+            translation = read_ingest_translations([key]).get(key)
+            if translation is not None:
+                rows = MessageRows(rows.fields + ("translation",), [result[0] + (translation,)])
+        return message_response(rows.shaped(requested_shape()))
 
     except Exception as e:
         print(f"[ERROR] get_msg failed: {e}")
         return jsonify({"error": "internal server error"}), 500
 
-    finally:
-        if client:
-            client.disconnect()
-
 
 # Routes pour les stats
 @app.route("/get_stats_chan", methods=["GET"])
@@ -1461,8 +3981,9 @@ def get_stats_chan():
     Param:
     * chant_name
     """
+    meta = current_metadata()
     # Connect to clickhouse
-    client = Client(host=clickhouse_host, port=clickhouse_port)
+    client = get_client()
 
     chat_name = request.args.get("chan_name")
     fresult = {}
@@ -1485,18 +4006,30 @@ def get_stats_chan():
     fresult["stats"] = True
     chat_id = int(result[0][0])
 
-    # Get the count of inserted document by last 31 jours
-    query = f"SELECT formatDateTime(toDate(toStartOfDay({DATE_COLUMN})), '%%d/%%m') as actual_date, count(*) as count FROM \
-              {database_name}.{table_name}  WHERE {DATE_COLUMN} >= toStartOfDay(subtractDays(now(), 31)) and chat_id = {chat_id} \
-              GROUP BY toStartOfDay({DATE_COLUMN}) order by toStartOfDay({DATE_COLUMN});"
-    result = client.execute(query, {})
+    # Les trois agrégats sont indépendants : on les lance en parallèle
+    results = run_query_batch(
+        {
+            # Get the count of inserted document by last 31 jours
+            "daily": f"SELECT formatDateTime(toDate(toStartOfDay({meta.date_column})), '%%d/%%m') as actual_date, count(*) as count FROM \
+              {database_name}.{table_name}  WHERE {meta.date_column} >= toStartOfDay(subtractDays(now(), 31)) and chat_id = {chat_id} \
+              GROUP BY toStartOfDay({meta.date_column}) order by toStartOfDay({meta.date_column});",
+            # Get the count of inserted document by last 24h
+            "hourly": f"SELECT formatDateTime(toStartOfHour({meta.date_column}), '%%H:00') as hour_formatted, count(*) as count FROM\
+             {database_name}.{table_name} WHERE {meta.date_column} >= subtractHours(now(), 24) AND chat_id = {chat_id} GROUP BY toStartOfHour({meta.date_column})\
+             ORDER BY toStartOfHour({meta.date_column}) DESC;",
+            # Get the count of inserted document by all months
+            "monthly": f"SELECT toStartOfMonth({meta.date_column}) as month, formatDateTime(toStartOfMonth({meta.date_column}), '%%Y/%%m') as month_formatted, count(*) as count FROM \
+              {database_name}.{table_name} WHERE {meta.date_column} >= subtractMonths(now(), 24) and chat_id = {chat_id} \
+              GROUP BY month ORDER BY month DESC",
+        }
+    )
 
     # Créer une liste de dates sur 31 jours à partir d'aujourd'hui
     today = date.today()  # Obtenir la date actuelle
     date_list = [(today - timedelta(days=i)).strftime("%d/%m") for i in range(31)]
 
     # Convertir les dates de daily_data en un dictionnaire
-    data_dict = {entry[0]: entry for entry in result}
+    data_dict = {entry[0]: entry for entry in results["daily"]}
 
     # Créer le tableau complet avec les 31 jours, remplis de 0 si data absente
     filled_data = []
@@ -1514,27 +4047,16 @@ def get_stats_chan():
 
     fresult["daily"] = filled_data
 
-    # Get the count of inserted document by last 24h
-    query = f"SELECT toStartOfHour({DATE_COLUMN}) as actual_hour, formatDateTime(toStartOfHour({DATE_COLUMN}), '%%H:00') as hour_formatted, count(*) as count from\
-             {database_name}.{table_name}  WHERE {DATE_COLUMN} >= subtractHours(now(), 24) and chat_id = {chat_id} GROUP BY actual_hour ORDER BY actual_hour DESC;"
-    query = f"SELECT formatDateTime(toStartOfHour({DATE_COLUMN}), '%%H:00') as hour_formatted, count(*) as count FROM\
-             {database_name}.{table_name} WHERE {DATE_COLUMN} >= subtractHours(now(), 24) AND chat_id = {chat_id} GROUP BY toStartOfHour({DATE_COLUMN})\
-             ORDER BY toStartOfHour({DATE_COLUMN}) DESC;"
-
-    result = client.execute(query, {})
-
     # 1. Créer une liste des dernières 24 heures à partir de l'heure actuelle
     now = datetime.now().replace(
         minute=0, second=0, microsecond=0
     )  # Obtenir la date et heure actuelle
-    # hours_list = [(now - timedelta(hours=i)) for i in range(24)]  # Créer une liste des dernières 24 heures
     hours_format_display = [
         (now - timedelta(hours=i)).strftime("%H:00") for i in range(24)
     ]  # Format "hh.00"
 
     # 2. Convertir les heures de daily_data en un dictionnaire pour accès rapide
-    # data_dict = {entry[0].replace(tzinfo=None): entry for entry in result}
-    data_dict = {entry[0]: entry for entry in result}
+    data_dict = {entry[0]: entry for entry in results["hourly"]}
 
     # 3. Créer le tableau complet avec les 24 heures
     filled_data = []
@@ -1550,84 +4072,113 @@ def get_stats_chan():
             filled_data.append((date_obj, 0))
 
     fresult["hourly"] = filled_data
+    fresult["monthly"] = results["monthly"]
 
-    # Get the count of inserted document by all months
-    query = f"SELECT toStartOfMonth({DATE_COLUMN}) as month, formatDateTime(toStartOfMonth({DATE_COLUMN}), '%%Y/%%m') as month_formatted, count(*) as count FROM \
-              {database_name}.{table_name} WHERE {DATE_COLUMN} >= subtractMonths(now(), 24) and chat_id = {chat_id} \
-              GROUP BY month ORDER BY month DESC"
-    result = client.execute(query, {})
-    fresult["monthly"] = result
-
-    del client
     return jsonify(fresult)
 
 
 # Routes pour les stats
-@app.route("/get_stats", methods=["GET"])
-def get_stats():
+def compute_stats():
     """
-    Retrieve all stats for TGStatsView.
+    Run the TGStatsView aggregates, one after the other: this runs in the
+    background and must not hold several pooled connections for its scans.
     """
-    # Connect to clickhouse
-    client = Client(host=clickhouse_host, port=clickhouse_port)
-
-    fresult = {}
-
-    # Get the count of inserted document by last 31 jours
-    query = f"SELECT toDate({INSERT_DATE_COLUMN}) as actual_date, formatDateTime(toDate({INSERT_DATE_COLUMN}), '%%d/%%m') as day_formatted, count(*) as count FROM \
-              {database_name}.{table_name} WHERE {INSERT_DATE_COLUMN} >= toStartOfDay(subtractDays(now(), 31)) GROUP BY actual_date  ORDER BY actual_date DESC;"
-    result = client.execute(query, {})
-    fresult["cdaily"] = result
+    meta = current_metadata()
+    results = run_query_batch(
+        {
+            # Get the count of inserted document by last 31 jours
+            "cdaily": f"SELECT toDate({meta.insert_date_column}) as actual_date, formatDateTime(toDate({meta.insert_date_column}), '%%d/%%m') as day_formatted, count(*) as count FROM \
+              {database_name}.{table_name} WHERE {meta.insert_date_column} >= toStartOfDay(subtractDays(now(), 31)) GROUP BY actual_date  ORDER BY actual_date DESC;",
+            # Get the count of inserted document by last 24h
+            "chourly": f"SELECT toStartOfHour({meta.insert_date_column}) as actual_hour, formatDateTime(toStartOfHour({meta.insert_date_column}), '%%H:00') as hour_formatted, count(*) as count FROM {database_name}.{table_name}  WHERE {meta.insert_date_column} >= subtractHours(now(), 24) GROUP BY actual_hour ORDER BY actual_hour DESC;",
+            # Get the count of inserted document by 24 months
+            "cmonthly": f"SELECT toStartOfMonth({meta.insert_date_column}) as month,     formatDateTime(toStartOfMonth({meta.insert_date_column}), '%%Y/%%m') as month_formatted, count(*) as count FROM {database_name}.{table_name} WHERE {meta.insert_date_column} >= subtractMonths(now(), 24) GROUP BY month ORDER BY month DESC limit 24",
+            # Get the count of document in db by publish day on last 31 days
+            "daily": f"SELECT toDate({meta.date_column}) as actual_date, formatDateTime(toDate({meta.date_column}), '%%d/%%m') as day_formatted, count(*) as count FROM \
+            {database_name}.{table_name} WHERE {meta.date_column} >= toStartOfDay(subtractDays(now(), 31)) GROUP BY actual_date  ORDER BY actual_date DESC;",
+            # Get the count of document in db by publish day on last 24h
+            "hourly": f"SELECT toStartOfHour({meta.date_column}) as actual_hour, formatDateTime(toStartOfHour({meta.date_column}), '%%H:00') as hour_formatted, count(*) as count FROM {database_name}.{table_name}  WHERE {meta.date_column} >= subtractHours(now(), 24) GROUP BY actual_hour ORDER BY actual_hour DESC;",
+            # Get the count of document in db by publish day on last 24 month
+            "monthly": f"SELECT toStartOfMonth({meta.date_column}) as month, formatDateTime(toStartOfMonth({meta.date_column}), '%%Y/%%m') as month_formatted, count(*) as count FROM {database_name}.{table_name} WHERE {meta.insert_date_column} >= subtractMonths(now(), 24) GROUP BY month ORDER BY month DESC limit 24",
+            # Get the number of differnet charts
+            "chats": f"SELECT countDistinct(chat_id) as distinct_chat_id_count FROM {database_name}.{table_name}",
+            # get the total nubmer on messages collecteds
+            "msgs": f"SELECT count(msg_id) as total_collected_messages FROM {database_name}.{table_name}",
+            # get the top 50 chatty chans
+            "top50": f"SELECT      chat_id, chat_name, COUNT(msg_id) AS msg_count FROM {database_name}.{table_name} GROUP BY chat_id, chat_name ORDER BY msg_count DESC LIMIT 50; ",
+            # Get stats about the db and compressions
+            "stats": "SELECT name,  formatReadableSize(sum(data_compressed_bytes)) AS compressed_size,    formatReadableSize(sum(data_uncompressed_bytes)) AS uncompressed_size,    round(sum(data_uncompressed_bytes) / sum(data_compressed_bytes), 2) AS ratio FROM system.columns WHERE table = 'msg' GROUP BY name",
+        },
+        # En série, les scans se cumulent : le délai suit l'intervalle de rafraîchissement
+        timeout=max(QUERY_BATCH_TIMEOUT, STATS_REFRESH_INTERVAL / 2),
+        parallel=False,
+    )
+    results["chats"] = results["chats"][0]
+    results["msgs"] = results["msgs"][0]
+    return results
 
-    # Get the count of inserted document by last 24h
-    query = f"SELECT toStartOfHour({INSERT_DATE_COLUMN}) as actual_hour, formatDateTime(toStartOfHour({INSERT_DATE_COLUMN}), '%%H:00') as hour_formatted, count(*) as count FROM {database_name}.{table_name}  WHERE {INSERT_DATE_COLUMN} >= subtractHours(now(), 24) GROUP BY actual_hour ORDER BY actual_hour DESC;"
-    result = client.execute(query, {})
-    fresult["chourly"] = result
 
-    # Get the count of inserted document by 24 months
-    query = f"SELECT toStartOfMonth({INSERT_DATE_COLUMN}) as month,     formatDateTime(toStartOfMonth({INSERT_DATE_COLUMN}), '%%Y/%%m') as month_formatted, count(*) as count FROM {database_name}.{table_name} WHERE {INSERT_DATE_COLUMN} >= subtractMonths(now(), 24) GROUP BY month ORDER BY month DESC limit 24"
-    result = client.execute(query, {})
-    fresult["cmonthly"] = result
+stats_snapshot = PeriodicSnapshot("stats", compute_stats, STATS_REFRESH_INTERVAL)
 
-    # Get the count of document in db by publish day on last 31 days
-    query = f"SELECT toStartOfMonth({INSERT_DATE_COLUMN}) as month, formatDateTime(toDate({INSERT_DATE_COLUMN}), '%%y/%%m'), count(*) as count FROM {database_name}.{table_name} WHERE {INSERT_DATE_COLUMN} >= subtractMonths(now(), 24) GROUP BY month ORDER BY month ASC"
-    query = f"SELECT toDate({DATE_COLUMN}) as actual_date, formatDateTime(toDate({DATE_COLUMN}), '%%d/%%m') as day_formatted, count(*) as count FROM \
-            {database_name}.{table_name} WHERE {DATE_COLUMN} >= toStartOfDay(subtractDays(now(), 31)) GROUP BY actual_date  ORDER BY actual_date DESC;"
-    result = client.execute(query, {})
-    fresult["daily"] = result
 
-    # Get the count of document in db by publish day on last 24h
-    query = f"SELECT toStartOfHour({DATE_COLUMN}) as actual_hour, formatDateTime(toStartOfHour({DATE_COLUMN}), '%%H:00') as hour_formatted, count(*) as count FROM {database_name}.{table_name}  WHERE {DATE_COLUMN} >= subtractHours(now(), 24) GROUP BY actual_hour ORDER BY actual_hour DESC;"
-    result = client.execute(query, {})
-    fresult["hourly"] = result
+@app.route("/get_stats", methods=["GET"])
+def get_stats():
+    """
+    Retrieve all stats for TGStatsView.
+    Served from the background refreshed snapshot, no ClickHouse work per hit.
+    """
+    fresult, taken_at = stats_snapshot.get()
+    if fresult is None:
+        return jsonify({"error": "stats unavailable"}), 503
+    return jsonify(dict(fresult, snapshot_age=round(time.time() - taken_at, 3)))
 
-    # Get the count of document in db by publish day on last 24 month
-    query = f"SELECT toStartOfMonth({DATE_COLUMN}) as month, formatDateTime(toStartOfMonth({DATE_COLUMN}), '%%Y/%%m') as month_formatted, count(*) as count FROM {database_name}.{table_name} WHERE {INSERT_DATE_COLUMN} >= subtractMonths(now(), 24) GROUP BY month ORDER BY month DESC limit 24"
-    result = client.execute(query, {})
-    fresult["monthly"] = result
 
-    # Get the number of differnet charts
-    query = f"SELECT countDistinct(chat_id) as distinct_chat_id_count FROM {database_name}.{table_name}"
-    result = client.execute(query, {})
-    fresult["chats"] = result[0]
+def _user_brief_summary(user_id):
+    '''
+        Count, chats and first/last date of a sender in one round trip,
+        from the sender_chats rollup when available.
+    '''
+    meta = current_metadata()
+    if meta.rollups_ready:
+        query = f"""
+            SELECT sum(msg_count), groupArray((chat_id, chat_name)), min(first_date), max(last_date)
+            FROM (
+                SELECT chat_id, anyLast(chat_name) AS chat_name, min(first_date) AS first_date,
+                       max(last_date) AS last_date, sum(msg_count) AS msg_count
+                FROM {rollup_table("sender_chats")}
+                WHERE sender_chat_id = %(user_id)s
+                GROUP BY chat_id
+            )
+        """
+    else:
+        query = f"""
+            SELECT count(), groupUniqArray((chat_id, chat_name)), min({meta.date_column}), max({meta.date_column})
+            FROM {database_name}.{table_name}
+            WHERE sender_chat_id = %(user_id)s
+        """
+    return get_client().execute(query, {"user_id": user_id})[0]
 
-    # get the total nubmer on messages collecteds
-    query = f"SELECT count(msg_id) as total_collected_messages FROM {database_name}.{table_name}"
-    result = client.execute(query, {})
-    fresult["msgs"] = result[0]
 
-    # get the top 50 chatty chans
-    query = f"SELECT      chat_id, chat_name, COUNT(msg_id) AS msg_count FROM {database_name}.{table_name} GROUP BY chat_id, chat_name ORDER BY msg_count DESC LIMIT 50; "
-    result = client.execute(query, {})
-    fresult["top50"] = result
+def _stream_user_brief(header, query, params, s_max):
+    '''
+        Stream the /user_brief JSON: the summary fields, then last_msgs row
+        by row straight from execute_iter, then has_more.
+    '''
+    head = app.json.dumps(header)[:-1]
 
-    # Get stats about the db and compressions
-    query = "SELECT name,  formatReadableSize(sum(data_compressed_bytes)) AS compressed_size,    formatReadableSize(sum(data_uncompressed_bytes)) AS uncompressed_size,    round(sum(data_uncompressed_bytes) / sum(data_compressed_bytes), 2) AS ratio FROM system.columns WHERE table = 'msg' GROUP BY name"
-    result = client.execute(query, {})
-    fresult["stats"] = result
+    def generate():
+        yield head + ', "last_msgs": ['
+        has_more = False
+        with clickhouse_pool.connection() as client:
+            # La requête est bornée à s_max + 1 lignes : on consomme tout le flux
+            for index, row in enumerate(client.execute_iter(query, params)):
+                if index >= s_max:
+                    has_more = True
+                    continue
+                yield (b"," if index else b"") + encode_json(row)
+        yield '], "has_more": ' + ("true" if has_more else "false") + "}"
 
-    del client
-    return jsonify(fresult)
+    return Response(generate(), mimetype="application/json")
 
 
 # Route pour avoir un message
@@ -1635,55 +4186,60 @@ def get_stats():
 def user_brief():
     '''
         This function give information about a User id
+        Two round trips at most: one summary aggregate, one streamed message list.
     '''
 
-    # Connect to clickhouse
-    client = Client(host=clickhouse_host, port=clickhouse_port)
-
+    meta = current_metadata()
     user_id = request.args.get("user_id")
     s_max = 500
-    has_more = False
-    json_result = {}
-    if valid_integer(user_id):
-        query = f"SELECT count(*) FROM {database_name}.{table_name} WHERE sender_chat_id = {user_id}"
-        json_result["msg_count"] = client.execute(query, {})[0][0]
-        if json_result["msg_count"] > 0:
-            query = f"SELECT chat_id, chat_name FROM {database_name}.{table_name} WHERE sender_chat_id = {user_id} group by chat_id, chat_name"
-            json_result["user_chats"] = client.execute(query, {})
-            query = f"SELECT {DATE_COLUMN} FROM {database_name}.{table_name} WHERE sender_chat_id == {user_id} order by {DATE_COLUMN} desc limit 1"
-            json_result["last_msg"] = client.execute(query, {})[0][0]
-            query = f"SELECT {DATE_COLUMN} FROM {database_name}.{table_name}  WHERE sender_chat_id == {user_id} order by {DATE_COLUMN} asc limit 1"
-            json_result["first_msg"] = client.execute(query, {})[0][0]
-            query = f"SELECT {star} FROM {database_name}.{table_name}  WHERE sender_chat_id == {user_id} order by {DATE_COLUMN} desc limit {s_max+1}"
-            result = client.execute(query, {})
-            has_more = False
-            if len(result) >= s_max + 1:
-                has_more = True
-            json_result["last_msgs"] = client.execute(query, {})[:-1]
-        else:
-            json_result["user_chats"] = None
-            json_result["last_msg"] = None
-            json_result["first_msg"] = None
-            json_result["last_msgs"] = None
-        json_result["has_more"] = has_more
-        # Préparer les résulats
-        del client
-        return jsonify(json_result)
-    else:
-        del client
+    if not valid_integer(user_id):
         return jsonify({})
+    user_id = int(user_id)
+
+    msg_count, chats, first_msg, last_msg = _user_brief_summary(user_id)
+    if not msg_count:
+        return jsonify(
+            {
+                "msg_count": 0,
+                "user_chats": None,
+                "last_msg": None,
+                "first_msg": None,
+                "last_msgs": None,
+                "has_more": False,
+            }
+        )
+
+    header = {
+        "msg_count": msg_count,
+        "user_chats": chats,
+        "last_msg": last_msg,
+        "first_msg": first_msg,
+    }
+    params = {"user_id": user_id}
+    where = "sender_chat_id = %(user_id)s"
+    if meta.rollups_ready:
+        # chat_id est dans la clé primaire : on restreint le scan aux chats de l'expéditeur
+        params["chats"] = tuple(chat[0] for chat in chats)
+        where = f"chat_id IN %(chats)s AND {where}"
+    query = f"""
+        SELECT {meta.star} FROM {database_name}.{table_name}
+        WHERE {where}
+        order by {meta.date_column} desc limit {s_max + 1}
+    """
+    return _stream_user_brief(header, query, params, s_max)
+
 
 @app.route("/stats_msg", methods=["GET"])
 def stats_msg():
+    meta = current_metadata()
     # Connect to clickhouse
-    client = Client(host=clickhouse_host, port=clickhouse_port)
+    client = get_client()
 
     query = f"""select count(msg_id), chat_id ,chat_name from {database_name}.{table_name}
-               where {DATE_COLUMN} > toDateTime('2024-09-04 00:00:00') and {DATE_COLUMN} < toDateTime('2024-09-04 23:59:59')
+               where {meta.date_column} > toDateTime('2024-09-04 00:00:00') and {meta.date_column} < toDateTime('2024-09-04 23:59:59')
                group by chat_id,chat_name order by count(msg_id) desc limit 25"""
     result = client.execute(query, {})
 
-    del client
     return jsonify(result)
 
 
@@ -1693,14 +4249,14 @@ def index():
     Provides last 500 messages collected
     With "final" statement
     """
+    meta = current_metadata()
     # Connect to clickhouse
-    client = Client(host=clickhouse_host, port=clickhouse_port)
+    client = get_client()
     # query = f"select date, chat_id, msg_id, chat_name from {database_name}.{table_name} final where date > now() - INTERVAL 1 HOUR order by date desc"
-    query = f"select formatDateTime(toTimeZone({DATE_COLUMN}, 'UTC'), '%%Y-%%m-%%dT%%H:%%i:%%S+00:00') AS date, chat_id, msg_id, chat_name from {database_name}.{table_name} order by {INSERT_DATE_COLUMN} desc, msg_id desc limit 500"
+    query = f"select formatDateTime(toTimeZone({meta.date_column}, 'UTC'), '%%Y-%%m-%%dT%%H:%%i:%%S+00:00') AS date, chat_id, msg_id, chat_name from {database_name}.{table_name} order by {meta.insert_date_column} desc, msg_id desc limit 500"
     result = client.execute(query, {})
 
-    del client
-    return jsonify(result)
+    return message_response(result)
 
 
 # Route pour les last messages
@@ -1710,15 +4266,48 @@ def count():
     Get the messages count in the database.
     """
     # Connect to clickhouse
-    client = Client(host=clickhouse_host, port=clickhouse_port)
+    client = get_client()
 
     query = f"select count() from {database_name}.{table_name}"
     result = client.execute(query, {})
 
-    del client
     return jsonify({"count": result[0][0]})
 
 
+# Champs d'un enregistrement /last, dans l'ordre des tuples de _format_last_message
+LAST_FIELDS = ("date", "text", "text_hash", "channel_id", "channel_name", "msg_id")
+
+
+def _format_last_message(row):
+    """Build the /last record (human readable text + ids) for one star row, as a LAST_FIELDS tuple."""
+    (
+        msg_id, chat_id, chat_name, username, sender_chat_id, title, date_text, insert_date,
+        document_present, document_name, document_type, document_size,
+        msg_fwd, msg_fwd_username, _msg_fwd_title, msg_fwd_id, text, _lang, _urls, _hashtags,
+    ) = row
+    htext = f"On {date_text} on Telegram\n"
+    htext += f"The following data was collected from the channel {chat_name}/{chat_id} with message id {msg_id}\n"
+    htext += (
+        f"User {username}/{sender_chat_id} wrote\n"
+    )
+    htext += f"Subject: {title}\n"
+    htext += "Content: " + text + "\n"
+    if msg_fwd == 1:
+        htext += f"It was a forward from the channel {msg_fwd_username}/{msg_fwd_id}\n"
+    if document_present == 1:
+        htext += f"The document {document_name}/{document_type} with a size of {document_size} bytes was attached to this messages.\n"
+    htext += f"\nThis message was acquired on {insert_date}\n"
+
+    return (
+        insert_date,
+        htext,
+        hashlib.md5(text.encode("utf-8", "ignore")).hexdigest(),
+        chat_id,
+        chat_name,
+        msg_id,
+    )
+
+
 @app.route("/last", methods=["GET"])
 def last():
     """
@@ -1733,6 +4322,7 @@ def last():
     #  wget "http://localhost:6000/last?since=1749342874&for=15" -O -  | jq .
     """
 
+    meta = current_metadata()
     if request.args.get("since"):
         since = request.args.get("since")  # Get Unix TimeStamp
     else:
@@ -1754,90 +4344,238 @@ def last():
         tfor = int(tfor)
     tfor = (tfor * 60) + since  # convert to millisec
 
-    page_size = 50000  # Taille des records par réponse (chunk)
+    chunk_size = LAST_CHUNK_ROWS  # Nombre de messages par ligne NDJSON envoyée
+    shape = requested_shape()
+    # Avec fields=, les lignes projetées sont renvoyées telles quelles au lieu du texte formaté
+    try:
+        fields = parse_fields(meta, request.args.get("fields"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    out_fields = fields or LAST_FIELDS
+    format_row = _format_last_message if fields is None else tuple
 
     def generate():
         """
-        Generator of message with pagination for query
+        Stream the window through a single server-side cursor (execute_iter)
+        ordered by (insert_date, chat_id, msg_id), flushing one JSON line
+        every chunk_size messages so memory stays flat.
+        """
+        # on ne demande que la date spécifé dans le post
+        # on ne prends pas les message de plus de 2 ans
+        # on ne prends pas les vide
+        query = f"""
+        SELECT {projection_clause(meta, fields)}
+        FROM {database_name}.{table_name} AS t
+        WHERE t.{meta.insert_date_column} >= toDateTime({since})
+          AND t.{meta.insert_date_column} <= toDateTime({tfor})
+          AND t.{meta.date_column} >= dateSub(now(), INTERVAL 2 YEAR)
+          AND ((document_present = 1) OR (text != ''))
+        ORDER BY t.{meta.insert_date_column}, t.chat_id, t.msg_id
         """
-        client = Client(host=clickhouse_host, port=clickhouse_port)
 
         messages = 0
-        offset = 0
+        out_rows = []
+        with clickhouse_pool.connection() as client:
+            rows = client.execute_iter(
+                query, {}, settings={"max_block_size": chunk_size}
+            )
+            for row in rows:
+                messages += 1
+                out_rows.append(format_row(row))
+                if len(out_rows) >= chunk_size:
+                    chunk = MessageRows(out_fields, out_rows)
+                    yield encode_json({"results": chunk.shaped(shape), "length": len(chunk)}) + b"\n"
+                    out_rows = []
+
+        if out_rows:
+            chunk = MessageRows(out_fields, out_rows)
+            yield encode_json({"results": chunk.shaped(shape), "length": len(chunk)}) + b"\n"
+        print(f"Send Messages {messages}")
 
-        # on ne demande que la date spécifé dans le post
-        # on ne prends pas les message de plus de 2 ans
-        # on ne prends pas les vide
-        while True:
-            # Requête SQL avec pagination et limite qui ne choppe pas les texte vide
-            query = f"""
-            SELECT {star} 
-            FROM {database_name}.{table_name} AS t
-            WHERE t.{INSERT_DATE_COLUMN} >= toDateTime({since}) 
-              AND t.{INSERT_DATE_COLUMN} <= toDateTime({tfor}) 
-              AND t.{DATE_COLUMN} >= dateSub(now(), INTERVAL 2 YEAR) 
-              AND ((document_present = 1) OR (text != '')) 
-            LIMIT {page_size} OFFSET {offset}
-            """
+    return Response(generate(), content_type="application/json")
 
-            # Exécuter la sql
-            result = client.execute(query, {})
-            print(f"SQL page fetched, offset: {offset}")  # Kindoff debug
 
-            # Si aucun résultat n'est retourné, arrêter
-            if not result:
-                break
+def invalidate_search_cache(message_dates):
+    """Drop cached searches whose scanned range overlaps the inserted message dates."""
+    if not search_cache.enabled or not message_dates:
+        return
+    dates = [_to_aware_datetime(value) for value in message_dates]
+    search_invalidations.publish(min(dates), max(dates))
+    dropped = search_cache.invalidate_range(min(dates), max(dates))
+    if dropped:
+        logger.info("Invalidated %s cached searches", dropped)
 
-            # Préparer les résultats
-            column_names = valid_fields
-            results_dict = [dict(zip(column_names, row)) for row in result]
-            out_dict = []
 
-            for msg in results_dict:
-                messages += 1
-                # Convertir les objets datetime en compatible json
-                msg["insert_date"] = msg.get("insert_date")
-                msg["date"] = msg.get("date")
-
-                htext = f"On {msg.get('date')} on Telegram\n"
-                htext += f"The following data was collected from the channel {msg.get('chat_name')}/{msg.get('chat_id')} with message id {msg.get('id')}\n"
-                htext += (
-                    f"User {msg.get('username')}/{msg.get('sender_chat_id')} wrote\n"
-                )
-                htext += f"Subject: {msg.get('title')}\n"
-                htext += "Content: " + msg.get("text") + "\n"
-                if msg.get("msg_fwd") == 1:
-                    htext += f"It was a forward from the channel {msg.get('msg_fwd_username')}/{msg.get('msg_fwd_id')}\n"
-                if msg.get("document_present") == 1:
-                    htext += f"The document {msg.get('document_name')}/{msg.get('document_type')} with a size of {msg.get('document_size')} bytes was attached to this messages.\n"
-                htext += f"\nThis message was acquired on {msg.get('insert_date')}\n"
-
-                out_dict.append(
-                    {
-                        "date": msg.get("insert_date"),
-                        "text": htext,
-                        "text_hash": hashlib.md5(
-                            msg.get("text").encode("utf-8", "ignore")
-                        ).hexdigest(),
-                        "channel_id": msg.get("chat_id"),
-                        "channel_name": msg.get("chat_name"),
-                        "msg_id": msg.get("id"),
-                    }
-                )
+class BufferFull(Exception):
+    """Raised when the insert buffer cannot take more rows."""
 
-            # Convertir en JSON et envoyer un chunk
-            yield json.dumps(
-                {"results": out_dict, "length": len(out_dict)},
-                default=serialize_datetime,
-            ) + "\n"
 
-            # Incrémenter l'offset pour la page suivante
-            offset += page_size
+class InsertTicket:
+    """Acknowledgement handed to a caller of InsertBuffer.submit()."""
 
-        print(f"Send Messages {messages}")
-        del client
+    def __init__(self, count):
+        self.count = count
+        self.error = None
+        self._done = threading.Event()
 
-    return Response(generate(), content_type="application/json")
+    def set_result(self, error=None):
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+
+class InsertBuffer:
+    '''
+        Write-behind buffer shared by concurrent /insert_records calls.
+
+        Records are grouped into a single INSERT once flush_rows rows are
+        pending or the oldest pending batch is max_age seconds old, which
+        keeps the number of MergeTree parts down. Each caller waits on its
+        InsertTicket until the INSERT carrying its rows has completed. When
+        a merged INSERT fails, each request is retried on its own so that
+        only the offending one gets the error. Pending plus in-flight rows
+        are capped at max_rows (BufferFull).
+    '''
+
+    def __init__(self, flush_rows=10000, max_age=2.0, max_rows=200000):
+        self.flush_rows = max(1, flush_rows)
+        self.max_age = max_age
+        self.max_rows = max(1, max_rows)
+        self._cond = threading.Condition()
+        self._batches = []  # (rows, ticket)
+        self._rows = 0
+        self._inflight = 0
+        self._oldest = None
+        self._closing = False
+        self._thread = None
+        self.flushes = 0
+
+    def submit(self, rows):
+        ticket = InsertTicket(len(rows))
+        with self._cond:
+            if self._closing:
+                raise BufferFull("Insert buffer is shutting down")
+            buffered = self._rows + self._inflight
+            # Un lot plus gros que la capacité passe quand même si le buffer est vide
+            if buffered and buffered + len(rows) > self.max_rows:
+                raise BufferFull(f"Insert buffer full ({buffered} rows pending)")
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="insert-buffer", daemon=True
+                )
+                self._thread.start()
+            self._batches.append((rows, ticket))
+            self._rows += len(rows)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if self._rows >= self.flush_rows:
+                self._cond.notify_all()
+        return ticket
+
+    def _ready(self):
+        if not self._batches:
+            return False
+        return (
+            self._closing
+            or self._rows >= self.flush_rows
+            or time.monotonic() - self._oldest >= self.max_age
+        )
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready():
+                    if self._closing and not self._batches:
+                        return
+                    timeout = None
+                    if self._batches:
+                        timeout = max(0.0, self.max_age - (time.monotonic() - self._oldest))
+                    self._cond.wait(timeout)
+                batches, self._batches = self._batches, []
+                self._inflight, self._rows, self._oldest = self._rows, 0, None
+            try:
+                self._flush(batches)
+            finally:
+                with self._cond:
+                    self._inflight = 0
+                    self._cond.notify_all()
+
+    def _flush(self, batches):
+        rows = [row for batch, _ in batches for row in batch]
+        try:
+            self._insert(rows)
+        except Exception as exc:
+            if len(batches) == 1:
+                logger.error("Failed to flush insert buffer: %s", exc)
+                batches[0][1].set_result(exc)
+                return
+            logger.warning(
+                "Merged flush of %d requests failed (%s), retrying them one by one",
+                len(batches), exc,
+            )
+        else:
+            logger.info(
+                f"Inserted {len(rows)} buffered records from {len(batches)} requests into ClickHouse"
+            )
+            for _, ticket in batches:
+                ticket.set_result(None)
+            return
+        # Seule la requête fautive échoue, les autres sont insérées séparément
+        for batch, ticket in batches:
+            try:
+                self._insert(batch)
+            except Exception as exc:
+                logger.error("Failed to insert a buffered request of %d rows: %s", len(batch), exc)
+                ticket.set_result(exc)
+            else:
+                ticket.set_result(None)
+
+    def _insert(self, rows):
+        with clickhouse_pool.connection() as client:
+            client.execute(f"INSERT INTO {database_name}.{table_name} VALUES", rows)
+        self.flushes += 1
+        invalidate_search_cache([row[DATE_INDEX] for row in rows])
+
+    def close(self, timeout=30):
+        """Refuse new rows, flush what is pending and wait for the flusher."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+insert_buffer = None
+INSERT_BUFFER_ACK_TIMEOUT = float(gn_config.get("insert_buffer_ack_timeout", 60))
+if gn_config.get("insert_buffer_enabled", False):
+    insert_buffer = InsertBuffer(
+        flush_rows=int(gn_config.get("insert_buffer_flush_rows", 10000)),
+        max_age=float(gn_config.get("insert_buffer_max_age", 2)),
+        max_rows=int(gn_config.get("insert_buffer_max_rows", 200000)),
+    )
+    atexit.register(insert_buffer.close)
+
+
+def _buffered_insert(records):
+    """Hand records to insert_buffer and wait for the flush carrying them."""
+    try:
+        ticket = insert_buffer.submit(records)
+    except BufferFull as exc:
+        response = jsonify({"status": "error", "message": str(exc)})
+        response.headers["Retry-After"] = str(max(1, math.ceil(insert_buffer.max_age)))
+        return response, 429
+    if not ticket.wait(INSERT_BUFFER_ACK_TIMEOUT):
+        # Les lignes restent dans le buffer : un nouvel envoi les dupliquerait
+        message = "Timed out waiting for buffered insert; the rows may still be inserted"
+        return jsonify({"status": "unknown", "message": message}), 504
+    if ticket.error is not None:
+        return jsonify({"status": "error", "message": str(ticket.error)}), 500
+    if translation_pipeline is not None:
+        translation_pipeline.submit(records)
+    return jsonify({"status": "success", "inserted_records": len(records)}), 200
 
 
 @app.route("/insert_records", methods=["POST"])
@@ -1858,28 +4596,330 @@ def insert_records():
     # Conversion des champs datetime pour chaque record
     records = [convert_record(record) for record in records]
 
+    if insert_buffer is not None:
+        return _buffered_insert(records)
+
     # Connect to clickhouse
-    client = Client(host=clickhouse_host, port=clickhouse_port)
+    client = get_client()
 
     try:
         client.execute(f"INSERT INTO {database_name}.{table_name} VALUES", records)
         logger.info(f"Inserted {len(records)} records into ClickHouse")
+        invalidate_search_cache([record[DATE_INDEX] for record in records])
+        if translation_pipeline is not None:
+            translation_pipeline.submit(records)
         return jsonify({"status": "success", "inserted_records": len(records)}), 200
     except Exception as e:
         logger.error("Failed to insert records: %s", e)
         return jsonify({"status": "error", "message": str(e)}), 500
+
+
+def _parse_bulk_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, timezone.utc)
+    if isinstance(value, str):
+        return parse_iso8601_flexible(value)
+    raise TypeError(f"unsupported date type {type(value).__name__}")
+
+
+def parse_datetime_column(values):
+    '''
+        Parse a whole date column at once: ISO 8601 strings or epoch seconds.
+        Identical values (typically insert_date within a batch) are parsed once.
+        Returns (parsed, errors) with errors mapping row position -> message.
+    '''
+    cache = {}
+    parsed = []
+    errors = {}
+    for index, value in enumerate(values):
+        try:
+            result = cache[value]
+        except KeyError:
+            try:
+                result = _parse_bulk_datetime(value)
+            except (TypeError, ValueError, OverflowError, OSError) as exc:
+                result = exc
+            cache[value] = result
+        except TypeError:
+            result = TypeError(f"unsupported date type {type(value).__name__}")
+        if isinstance(result, Exception):
+            errors[index] = f"invalid date {value!r}: {result}"
+            parsed.append(None)
+        else:
+            parsed.append(result)
+    return parsed, errors
+
+
+_INTEGER_TYPE = re.compile(r"(U?)Int(8|16|32|64|128|256)$")
+
+
+def _column_check(column_type):
+    '''
+        Validator of one bulk value for a ClickHouse column type: returns
+        the value coerced for the driver or raises ValueError. None for the
+        types not checked here (left to the driver).
+    '''
+    if column_type.startswith("LowCardinality("):
+        return _column_check(column_type[len("LowCardinality("):-1])
+    if column_type.startswith("Nullable("):
+        inner = _column_check(column_type[len("Nullable("):-1])
+        if inner is None:
+            return None
+        return lambda value: None if value is None else inner(value)
+    if column_type.startswith("Array("):
+        inner = _column_check(column_type[len("Array("):-1])
+
+        def check_array(value):
+            if not isinstance(value, (list, tuple)):
+                raise ValueError(f"expected a list, got {type(value).__name__}")
+            return [inner(item) for item in value] if inner else list(value)
+        return check_array
+    match = _INTEGER_TYPE.match(column_type)
+    if match:
+        bits = int(match.group(2))
+        low, high = (0, 2 ** bits - 1) if match.group(1) else (-2 ** (bits - 1), 2 ** (bits - 1) - 1)
+
+        def check_integer(value):
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            elif isinstance(value, str) and valid_integer(value):
+                value = int(value)
+            if not isinstance(value, int):
+                raise ValueError(f"expected an integer, got {value!r}")
+            if not low <= value <= high:
+                raise ValueError(f"{value} out of range for {column_type}")
+            return int(value)
+        return check_integer
+    if column_type.startswith("Float"):
+        def check_float(value):
+            if isinstance(value, (int, float)):
+                return float(value)
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"expected a number, got {value!r}")
+        return check_float
+    if column_type == "String" or column_type.startswith("FixedString("):
+        def check_string(value):
+            if not isinstance(value, (str, bytes)):
+                raise ValueError(f"expected a string, got {type(value).__name__}")
+            return value
+        return check_string
+    return None
+
+
+def bulk_column_checks(meta):
+    '''
+        One _column_check() per valid_fields position, from the column types
+        of meta (None for the dates, parsed by parse_datetime_column, and
+        for unknown columns).
+    '''
+    columns = {"id": "msg_id", "date": meta.date_column, "insert_date": meta.insert_date_column}
+    checks = []
+    for field in valid_fields:
+        column_type = meta.column_types.get(columns.get(field, field))
+        if field in ("date", "insert_date") or not column_type:
+            checks.append(None)
+        else:
+            checks.append(_column_check(column_type))
+    return tuple(checks)
+
+
+def _bulk_record_to_row(record, checks=()):
+    '''
+        Validate one bulk record (positional list or object) and return it
+        positional, each value checked against the table schema (`checks`
+        from bulk_column_checks).
+    '''
+    if isinstance(record, Exception):
+        raise ValueError(f"unparsable record: {record}")
+    if isinstance(record, dict):
+        row = [None] * len(valid_fields)
+        for name, value in record.items():
+            if name not in RECORD_POSITIONS:
+                raise ValueError(f"unknown field {name!r}")
+            row[RECORD_POSITIONS[name]] = value
+        missing = [valid_fields[index] for index, value in enumerate(row) if value is None]
+        if missing:
+            raise ValueError(f"missing fields {', '.join(missing)}")
+    elif isinstance(record, (list, tuple)):
+        if len(record) != len(valid_fields):
+            raise ValueError(f"expected {len(valid_fields)} fields, got {len(record)}")
+        row = list(record)
+    else:
+        raise ValueError("record must be a list or an object")
+    for name in ("id", "chat_id"):
+        if not valid_integer(row[RECORD_POSITIONS[name]]):
+            raise ValueError(f"{name} must be an integer")
+    for index, check in enumerate(checks):
+        if check is not None:
+            try:
+                row[index] = check(row[index])
+            except ValueError as exc:
+                raise ValueError(f"{valid_fields[index]}: {exc}")
+    return row
+
+
+def _iter_bulk_records():
+    """Yield decoded records from the request body without buffering it whole."""
+    if request.mimetype in MSGPACK_MIMETYPES:
+        yield from msgpack.Unpacker(request.stream, raw=False)
+        return
+    for line in request.stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield exc
+
+
+# Valeurs refusées par le driver à la sérialisation (le serveur n'a rien reçu)
+_ROW_DATA_ERRORS = (
+    TypeMismatchError, TypeError, ValueError, OverflowError, AttributeError, IndexError, struct.error
+)
+
+
+def _insert_bulk_columns(client, columns, row_numbers):
+    '''
+        Columnar INSERT of columns. When the driver still rejects a value
+        (types that bulk_column_checks does not cover), the rows are
+        bisected so that only the offending ones are reported.
+        Returns (inserted_count, errors, message_dates).
+    '''
+    try:
+        client.execute(
+            f"INSERT INTO {database_name}.{table_name} VALUES", columns, columnar=True
+        )
+        return len(row_numbers), [], columns[DATE_INDEX]
+    except _ROW_DATA_ERRORS as exc:
+        if len(row_numbers) == 1:
+            return 0, [(row_numbers[0], f"rejected value: {exc}")], []
+    middle = len(row_numbers) // 2
+    inserted, errors, dates = 0, [], []
+    for part in (slice(None, middle), slice(middle, None)):
+        count, part_errors, part_dates = _insert_bulk_columns(
+            client, [column[part] for column in columns], row_numbers[part]
+        )
+        inserted += count
+        errors.extend(part_errors)
+        dates.extend(part_dates)
+    return inserted, errors, dates
+
+
+def _flush_bulk_rows(client, rows, row_numbers):
+    '''
+        Insert buffered rows as one columnar INSERT after bulk date parsing.
+        Returns (inserted_count, errors, message_dates).
+    '''
+    columns = [list(column) for column in zip(*rows)]
+    columns[DATE_INDEX], date_errors = parse_datetime_column(columns[DATE_INDEX])
+    columns[INSERT_DATE_INDEX], insert_errors = parse_datetime_column(
+        columns[INSERT_DATE_INDEX]
+    )
+    bad = dict(insert_errors)
+    bad.update(date_errors)
+    errors = [(row_numbers[index], message) for index, message in sorted(bad.items())]
+    if bad:
+        keep = [index for index in range(len(rows)) if index not in bad]
+        columns = [[column[index] for index in keep] for column in columns]
+        row_numbers = [row_numbers[index] for index in keep]
+    if columns and columns[0]:
+        inserted, insert_errors, dates = _insert_bulk_columns(client, columns, row_numbers)
+        return inserted, sorted(errors + insert_errors), dates
+    return 0, errors, []
+
+
+@app.route("/insert_records_bulk", methods=["POST"])
+def insert_records_bulk():
+    """
+    # Bulk ingestion for the collectors.
+    # Body: NDJSON (one record per line) or a msgpack stream (Content-Type application/msgpack).
+    # A record is either the positional list used by /insert_records or an object keyed by column name,
+    # dates as ISO 8601 strings or epoch seconds.
+    # Rows are inserted column by column per batch, invalid rows are reported and skipped.
+    """
+    if request.mimetype in MSGPACK_MIMETYPES and msgpack is None:
+        return jsonify({"status": "error", "message": "msgpack bodies require the msgpack package"}), 415
+
+    client = get_client()
+    checks = bulk_column_checks(current_metadata())
+    inserted = 0
+    rejected = 0
+    errors = []
+    message_dates = []
+    rows = []
+    row_numbers = []
+
+    def record_errors(batch_errors):
+        nonlocal rejected
+        rejected += len(batch_errors)
+        for row_number, message in batch_errors:
+            if len(errors) < INGEST_MAX_ERRORS:
+                errors.append({"row": row_number, "error": message})
+
+    def flush():
+        nonlocal inserted
+        count, batch_errors, dates = _flush_bulk_rows(client, rows, row_numbers)
+        inserted += count
+        if dates:
+            aware = [_to_aware_datetime(value) for value in dates]
+            message_dates.extend((min(aware), max(aware)))
+        record_errors(batch_errors)
+        rows.clear()
+        row_numbers.clear()
+
+    try:
+        for row_number, record in enumerate(_iter_bulk_records()):
+            try:
+                rows.append(_bulk_record_to_row(record, checks))
+                row_numbers.append(row_number)
+            except ValueError as exc:
+                record_errors([(row_number, str(exc))])
+            if len(rows) >= INGEST_BATCH_ROWS:
+                flush()
+        if rows:
+            flush()
+    except ValueError as exc:
+        # Flux illisible
+        return jsonify({"status": "error", "message": str(exc), "inserted_records": inserted}), 400
+    except Exception as e:
+        logger.error("Failed to bulk insert records: %s", e)
+        return jsonify({"status": "error", "message": str(e), "inserted_records": inserted}), 500
     finally:
-        del client
+        if message_dates:
+            invalidate_search_cache([min(message_dates), max(message_dates)])
+
+    logger.info(f"Bulk inserted {inserted} records into ClickHouse, {rejected} rejected")
+    return jsonify(
+        {
+            "status": "success" if not rejected else "partial",
+            "inserted_records": inserted,
+            "rejected_records": rejected,
+            "errors": errors,
+        }
+    ), 200
 
 
 @app.route("/graph", methods=["GET"])
 def get_graph():
+    meta = current_metadata()
     chat_id = request.args.get("chat_id")
 
-    clickhouse_client = Client(host=clickhouse_host, port=clickhouse_port)
     if not chat_id:
         return jsonify({"error": "chat_id is required"}), 400
+    if not valid_integer(chat_id):
+        return jsonify({"error": "Invalid chat_id"}), 400
+    chat_id = int(chat_id)
 
+    cached = graph_cache.get(chat_id) if graph_cache.enabled else None
+    if cached is not None:
+        return jsonify(cached)
+
+    clickhouse_client = get_client()
     try:
         # Requête pour récupérer les nouds (utilisateurs du chat_id)
         nodes_query = f"""
@@ -1893,10 +4933,7 @@ def get_graph():
             AND sender_chat_id != {chat_id}
             limit 100
         """
-
-        # Exécution des requêtes
         nodes_result = clickhouse_client.execute(nodes_query)
-        # edges_result = clickhouse_client.execute(edges_query)
 
         # Dictionnaire pour assurer l'unicité des nœuds
         nodes_map = {}
@@ -1924,23 +4961,10 @@ def get_graph():
                 "color": "purple",
             }
         ]  # Ajouter le channel principal
+        node_ids = {1}
 
-        edges = []
-        seen_edges = set()
-
-        for row in nodes_result:
-            from_id = 1  # Assumons que le noeud source est toujours 1
-            to_id = row[0]  # id du nœud cible
-            edge_label = ""  # Label pour l'arête
-
-            edge = (from_id, to_id)  # Crée un tuple représentant l'arête
-
-            # Vérifie si l'arête n'a pas encore été ajoutée
-            if edge not in seen_edges:
-                edges.append({"from": from_id, "to": to_id, "label": edge_label})
-                seen_edges.add(
-                    edge
-                )  # Ajoute l'arête à l'ensemble pour éviter les doublons
+        # Une arête du channel principal vers chaque utilisateur
+        edges = [{"from": 1, "to": user_id, "label": ""} for user_id in nodes_map]
 
         # Ajouter les utilisateurs comme nœuds
         for user_id, user_data in nodes_map.items():
@@ -1950,45 +4974,55 @@ def get_graph():
                     "label": f'{user_data["id"]}\n' + "\n".join(user_data["labels"]),
                 }
             )
+            node_ids.add(user_id)
 
-        # Vérifier si chaque utilisateur est aussi dans d'autres chats
-        for user_id in nodes_map.keys():
+        # Les autres chats de tous les utilisateurs en une seule requête
+        other_chats_result = []
+        if nodes_map:
+            source = rollup_table("sender_chats") if meta.rollups_ready else f"{database_name}.{table_name}"
             other_chats_query = f"""
-                SELECT DISTINCT chat_id, chat_name
-                FROM {database_name}.{table_name}
-                WHERE sender_chat_id = {user_id}
-                AND chat_id != {chat_id} 
+                SELECT sender_chat_id, chat_id, anyLast(chat_name)
+                FROM {source}
+                WHERE sender_chat_id IN %(senders)s
+                AND chat_id != {chat_id}
+                GROUP BY sender_chat_id, chat_id
             """
-            other_chats_result = clickhouse_client.execute(other_chats_query)
+            other_chats_result = clickhouse_client.execute(
+                other_chats_query, {"senders": tuple(nodes_map)}
+            )
 
-            for other_chat in other_chats_result:
-                other_chat_id = other_chat[0]
-                other_chat_node_id = (
-                    f"{other_chat_id}"  # ID unique pour éviter les conflits
-                )
+        seen_edges = set()
+        for user_id, other_chat_id, other_chat_name in other_chats_result:
+            other_chat_node_id = (
+                f"{other_chat_id}"  # ID unique pour éviter les conflits
+            )
 
-                # Ajouter le nouveau chat en rouge s'il n'existe pas déjà
-                if not any(n["id"] == other_chat_node_id for n in nodes):
-                    nodes.append(
-                        {
-                            "id": other_chat_node_id,
-                            "label": f"{other_chat_id}\n{other_chat[1]}",
-                            "color": "red",
-                            "shape": "box",
-                        }
-                    )
+            # Ajouter le nouveau chat en rouge s'il n'existe pas déjà
+            if other_chat_node_id not in node_ids:
+                nodes.append(
+                    {
+                        "id": other_chat_node_id,
+                        "label": f"{other_chat_id}\n{other_chat_name}",
+                        "color": "red",
+                        "shape": "box",
+                    }
+                )
+                node_ids.add(other_chat_node_id)
 
-                # Vérifie si user_id est différent de other_chat_node_id avant d'ajouter l'arête
-                if str(user_id) != other_chat_node_id:
-                    edges.append({"from": user_id, "to": other_chat_node_id})
+            # Vérifie si user_id est différent de other_chat_node_id avant d'ajouter l'arête
+            edge = (user_id, other_chat_node_id)
+            if str(user_id) != other_chat_node_id and edge not in seen_edges:
+                edges.append({"from": user_id, "to": other_chat_node_id})
+                seen_edges.add(edge)
 
+        graph = {"nodes": nodes, "edges": edges}
+        if graph_cache.enabled:
+            graph_cache.put(chat_id, graph, None, None)
         # Retourner les données au format JSON
-        return jsonify({"nodes": nodes, "edges": edges})
+        return jsonify(graph)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        del clickhouse_client
 
 
 @app.route("/user_talk/<int:user>", methods=["GET"])
@@ -1997,10 +5031,11 @@ def user_talk(user):
         Requête ClickHouse pour récupérer les données pour un user donné
     '''
 
-    client = Client(host=clickhouse_host, port=clickhouse_port)
+    meta = current_metadata()
+    client = get_client()
     query = f"""
     SELECT
-        toDate({DATE_COLUMN}) AS day,
+        toDate({meta.date_column}) AS day,
         chat_id,
         chat_name,
         COUNT(*) AS count
@@ -2009,6 +5044,14 @@ def user_talk(user):
     GROUP BY day, chat_id, chat_name
     ORDER BY day
     """
+    if meta.rollups_ready:
+        query = f"""
+        SELECT day, chat_id, anyLast(chat_name) AS chat_name, sum(msg_count) AS count
+        FROM {rollup_table("sender_daily")}
+        WHERE sender_chat_id = {user}
+        GROUP BY day, chat_id
+        ORDER BY day
+        """
 
     # Exécuter la requête ClickHouse et obtenir le résultat
     result = client.execute(query)
@@ -2038,7 +5081,6 @@ def user_talk(user):
                     "count": chat_info["count"],
                 }
             )
-    del client
     return jsonify(formatted_data)
 
 
@@ -2048,12 +5090,13 @@ def user_dailytalk(user_id):
         Give a heatmap data for the activity of a User. GMT based.
     '''
 
-    client = Client(host=clickhouse_host, port=clickhouse_port)
+    meta = current_metadata()
+    client = get_client()
     # Requête pour récupérer les données depuis ClickHouse
     query = f"""
     SELECT
-        toHour({DATE_COLUMN}) AS hour,                  -- Extraire l'heure
-        toDayOfWeek({DATE_COLUMN}) AS day_of_week,      -- Extraire le jour de la semaine (1 = lundi, 2 = mardi, ...)
+        toHour({meta.date_column}) AS hour,                  -- Extraire l'heure
+        toDayOfWeek({meta.date_column}) AS day_of_week,      -- Extraire le jour de la semaine (1 = lundi, 2 = mardi, ...)
         count(*) AS message_count              -- Compter le nombre de messages
     FROM
         {database_name}.{table_name}  -- Nom de la table
@@ -2066,6 +5109,14 @@ def user_dailytalk(user_id):
         day_of_week ASC,                       -- Trier par jour de la semaine (lundi = 1, dimanche = 7)
         hour ASC                               -- Trier par heure (0 à 23)
     """
+    if meta.rollups_ready:
+        query = f"""
+        SELECT hour, day_of_week, sum(msg_count) AS message_count
+        FROM {rollup_table("sender_heatmap")}
+        WHERE sender_chat_id = {user_id}
+        GROUP BY day_of_week, hour
+        ORDER BY day_of_week ASC, hour ASC
+        """
     # Exécuter la requête
     result = client.execute(query)
     if not result:  # Si pas de data, empty reponse.
@@ -2102,11 +5153,33 @@ def user_dailytalk(user_id):
         # Ajouter les messages dans le bon jour et heure
         heatmap_data[day_of_week][hour] = local_count
 
-    del client
     # Convertir le dictionnaire en JSON
     return jsonify(heatmap_data)
 
 
+def _user_details_from_rollups(user_id):
+    """First/last dates and (chat_id, chat_name, username) triples from the sender_chats rollup."""
+    rows = get_client().execute(
+        f"""
+        SELECT chat_id, anyLast(chat_name), min(first_date), max(last_date),
+               groupUniqArrayArray(usernames)
+        FROM {rollup_table("sender_chats")}
+        WHERE sender_chat_id = %(user_id)s
+        GROUP BY chat_id
+        """,
+        {"user_id": user_id},
+    )
+    if not rows:
+        return {"first": [], "last": [], "pseudos": []}
+    return {
+        "first": [(min(row[2] for row in rows),)],
+        "last": [(max(row[3] for row in rows),)],
+        "pseudos": [
+            ((row[0], row[1], username),) for row in rows for username in row[4]
+        ],
+    }
+
+
 @app.route("/user_details/<int:user_id>")
 def user_details(user_id):
     '''
@@ -2115,27 +5188,31 @@ def user_details(user_id):
             Give Active since and to
             Give On which channel the user is present
     '''
-    client = Client(host=clickhouse_host, port=clickhouse_port)
+    meta = current_metadata()
     # Requête pour récupérer les données depuis ClickHouse
     if not valid_integer(user_id):
         return jsonify({"results": False})
 
-    query = f" select {DATE_COLUMN} from {database_name}.{table_name} where sender_chat_id = {user_id} order by {DATE_COLUMN} asc limit 1;"
-    data = client.execute(query)
+    if meta.rollups_ready:
+        results = _user_details_from_rollups(int(user_id))
+    else:
+        results = run_query_batch(
+            {
+                "first": f" select {meta.date_column} from {database_name}.{table_name} where sender_chat_id = {user_id} order by {meta.date_column} asc limit 1;",
+                "last": f" select {meta.date_column} from {database_name}.{table_name} where sender_chat_id = {user_id} order by {meta.date_column} desc limit 1;",
+                "pseudos": f"SELECT distinct(chat_id,chat_name, username ) FROM {database_name}.{table_name} where sender_chat_id == {user_id}",
+            }
+        )
+    data = results["first"]
     if not data:
         return jsonify({"results": False})
     date_in = data[0][0].strftime("%d/%m/%Y")
-
-    query = f" select {DATE_COLUMN} from {database_name}.{table_name} where sender_chat_id = {user_id} order by {DATE_COLUMN} desc limit 1;"
-    data = client.execute(query)
-    date_out = data[0][0].strftime("%d/%m/%Y")
+    date_out = results["last"][0][0].strftime("%d/%m/%Y")
 
     resume = f"Account {user_id} is active since {date_in} to {date_out}"
 
-    query = f"SELECT distinct(chat_id,chat_name, username ) FROM {database_name}.{table_name} where sender_chat_id == {user_id}"
-
     pseudos = []
-    data = client.execute(query)
+    data = results["pseudos"]
     for line in data:
         username = line[0][2].replace(
             "None", ""
@@ -2148,5 +5225,158 @@ def user_details(user_id):
     return jsonify({"resume": resume, "pseudos": pseudos, "results": True})
 
 
+# Serveur de production : workers préforkés (gunicorn) à partir de l'application préchargée
+SERVER_HOST = gn_config.get("app_host", "0.0.0.0")
+SERVER_WORKERS = max(1, int(gn_config.get("server_workers", 4)))
+SERVER_THREADS = max(1, int(gn_config.get("server_threads", 8)))
+SERVER_TIMEOUT = int(gn_config.get("server_timeout", 120))
+SERVER_GRACEFUL_TIMEOUT = int(gn_config.get("server_graceful_timeout", 30))
+SERVER_MAX_REQUESTS = int(gn_config.get("server_max_requests", 0))
+
+
+def reset_after_fork():
+    '''
+        Give a forked worker its own connection pool and executors. Sockets
+        and worker threads do not survive fork(); sharing the parent's would
+        interleave two processes on one ClickHouse connection. The snapshot
+        and buffer threads restart on first use, libretranslate_pool,
+        translation_cache and translation_pipeline check the pid themselves.
+    '''
+    global _search_executor, _query_executor, _translate_executor
+    clickhouse_pool.reset_after_fork()
+    _search_executor = ThreadPoolExecutor(
+        max_workers=SEARCH_WORKERS, thread_name_prefix="search-window"
+    )
+    _query_executor = ThreadPoolExecutor(
+        max_workers=QUERY_BATCH_WORKERS, thread_name_prefix="query-batch"
+    )
+    _translate_executor = ThreadPoolExecutor(
+        max_workers=TRANSLATE_BATCH_CONCURRENCY, thread_name_prefix="translate"
+    )
+
+
+# Couvre aussi les serveurs lancés de l'extérieur (gunicorn db_svr:app --preload, uwsgi...)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+
+def shutdown_worker():
+    """Flush the insert buffer and pending translations, close the pooled connections."""
+    if insert_buffer is not None:
+        insert_buffer.close()
+    if translation_pipeline is not None:
+        translation_pipeline.close()
+    metadata_snapshot.stop()
+    clickhouse_pool.close()
+
+
+def preload_for_fork():
+    '''
+        Load what every worker needs before the master forks them: a fresh
+        metadata snapshot (the saved one is kept if ClickHouse is down), so
+        workers answer at once without each querying the schema.
+    '''
+    metadata_snapshot.refresh()
+    # Les connexions ouvertes pour le chargement ne doivent pas être héritées
+    clickhouse_pool.close()
+
+
+if BaseApplication is not None:
+
+    class ProductionServer(BaseApplication):
+        '''
+            gunicorn with the settings of gn_config.yaml: SERVER_WORKERS
+            preforked processes of SERVER_THREADS threads each, so a slow
+            route (/last, /graph...) only holds one thread. SIGHUP replaces
+            the workers gracefully, SIGTERM drains them within
+            SERVER_GRACEFUL_TIMEOUT seconds.
+        '''
+
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+
+def run_production_server(host, port):
+    if BaseApplication is None:
+        logger.warning("gunicorn is not installed, serving with threaded Werkzeug in one process")
+        preload_for_fork()
+        app.run(host=host, port=port, threaded=True)
+        return
+    preload_for_fork()
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": SERVER_WORKERS,
+        "threads": SERVER_THREADS,
+        "worker_class": "gthread",
+        "timeout": SERVER_TIMEOUT,
+        "graceful_timeout": SERVER_GRACEFUL_TIMEOUT,
+        "max_requests": SERVER_MAX_REQUESTS,
+        "max_requests_jitter": SERVER_MAX_REQUESTS // 10,
+        "preload_app": True,
+        "worker_exit": lambda server, worker: shutdown_worker(),
+    }
+    ProductionServer(app, options).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EyeTroduit ClickHouse API")
+    commands = parser.add_subparsers(dest="command")
+    serve = commands.add_parser("serve", help="Run the production server (default)")
+    serve.add_argument(
+        "--dev", action="store_true", help="Run the single-process debug server instead"
+    )
+    rollups = commands.add_parser(
+        "create-rollups", help="Create the per-sender rollup tables and views"
+    )
+    rollups.add_argument(
+        "--backfill", action="store_true", help="Rebuild the rollups from existing rows"
+    )
+    lookups = commands.add_parser(
+        "create-lookup-tables", help="Create the exploded hashtag and url lookup tables"
+    )
+    lookups.add_argument(
+        "--backfill", action="store_true", help="Rebuild the lookup tables from existing rows"
+    )
+    text_indexes = commands.add_parser(
+        "create-text-indexes",
+        help="Add the tokenbf/ngrambf skip indexes on text, chat_name and document_name",
+    )
+    text_indexes.add_argument(
+        "--materialize", action="store_true", help="Also build the indexes for existing parts"
+    )
+    args = parser.parse_args()
+
+    if args.command == "create-lookup-tables":
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+        create_lookup_tables(backfill=args.backfill)
+        return
+
+    if args.command == "create-text-indexes":
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+        create_text_indexes(materialize=args.materialize)
+        return
+
+    if args.command == "create-rollups":
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+        create_rollups(backfill=args.backfill)
+        return
+
+    port = int(app_port or 5000)
+    if getattr(args, "dev", False):
+        app.run(debug=True, host=SERVER_HOST, port=port)
+        return
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    run_production_server(SERVER_HOST, port)
+
+
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=app_port)
+    main()
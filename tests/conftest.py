@@ -0,0 +1,29 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("clickhouse_driver")
+pytest.importorskip("yaml")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG = os.path.join(ROOT, "gn_config.yaml")
+
+# db_svr lit gn_config.yaml à l'import : on prend l'exemple s'il n'y en a pas
+_copied_config = not os.path.exists(CONFIG)
+if _copied_config:
+    shutil.copy(os.path.join(ROOT, "gn_config.yaml.sample"), CONFIG)
+sys.path.insert(0, ROOT)
+
+
+def pytest_unconfigure(config):
+    if _copied_config and os.path.exists(CONFIG):
+        os.remove(CONFIG)
+
+
+@pytest.fixture(scope="session")
+def db_svr():
+    import db_svr
+    return db_svr
@@ -0,0 +1,101 @@
+import math
+
+import pytest
+
+
+def _record(db_svr, **values):
+    record = {
+        "id": 1, "chat_id": 2, "chat_name": "chat", "username": "user",
+        "sender_chat_id": 3, "title": "title", "date": "2024-05-01T10:00:00Z",
+        "insert_date": "2024-05-01T10:00:05Z", "document_present": 0,
+        "document_name": "", "document_type": "", "document_size": 0,
+        "msg_fwd": 0, "msg_fwd_username": "", "msg_fwd_title": "", "msg_fwd_id": 0,
+        "text": "hello", "lang": "en", "urls": [], "hashtags": [],
+    }
+    record.update(values)
+    assert set(record) == set(db_svr.valid_fields)
+    return record
+
+
+def test_record_with_null_id_is_rejected(db_svr):
+    with pytest.raises(ValueError, match="missing fields id"):
+        db_svr._bulk_record_to_row(_record(db_svr, id=None))
+    row = [None] + [0] * (len(db_svr.valid_fields) - 1)
+    with pytest.raises(ValueError, match="id must be an integer"):
+        db_svr._bulk_record_to_row(row)
+
+
+def test_record_checked_against_column_types(db_svr):
+    checks = [None] * len(db_svr.valid_fields)
+    checks[db_svr.RECORD_POSITIONS["document_size"]] = db_svr._column_check("UInt32")
+    row = db_svr._bulk_record_to_row(_record(db_svr, document_size="12"), checks)
+    assert row[db_svr.RECORD_POSITIONS["document_size"]] == 12
+    with pytest.raises(ValueError, match="document_size: -1 out of range"):
+        db_svr._bulk_record_to_row(_record(db_svr, document_size=-1), checks)
+
+
+def test_column_check(db_svr):
+    assert db_svr._column_check("Int8")(127.0) == 127
+    with pytest.raises(ValueError):
+        db_svr._column_check("Int8")(128)
+    with pytest.raises(ValueError):
+        db_svr._column_check("UInt64")("abc")
+    assert db_svr._column_check("Nullable(Int64)")(None) is None
+    assert db_svr._column_check("Array(LowCardinality(String))")(("a", "b")) == ["a", "b"]
+    with pytest.raises(ValueError):
+        db_svr._column_check("Array(String)")("a")
+    with pytest.raises(ValueError):
+        db_svr._column_check("String")(1)
+    assert db_svr._column_check("Float64")("1.5") == 1.5
+    assert db_svr._column_check("DateTime64(3)") is None
+
+
+def test_parse_datetime_column_reports_bad_values(db_svr):
+    values = ["2024-05-01T10:00:00Z", 1e20, math.nan, None, "not a date", 0]
+    parsed, errors = db_svr.parse_datetime_column(values)
+    assert sorted(errors) == [1, 2, 3, 4]
+    assert parsed[0].year == 2024 and parsed[5].year == 1970
+    assert parsed[1] is None
+
+
+class FakeClient:
+    """Refuse l'INSERT dès qu'une colonne contient une valeur de `bad`."""
+
+    def __init__(self, bad):
+        self.bad = bad
+        self.inserted = []
+
+    def execute(self, query, columns, columnar=False):
+        if any(value in self.bad for column in columns for value in column):
+            raise TypeError("bad value")
+        self.inserted.extend(columns[0])
+
+
+def test_insert_bulk_columns_isolates_rejected_rows(db_svr):
+    client = FakeClient({"x"})
+    width = len(db_svr.valid_fields)
+    rows = [[index] * width for index in range(6)]
+    rows[2][4] = "x"
+    rows[5][4] = "x"
+    columns = [list(column) for column in zip(*rows)]
+    inserted, errors, dates = db_svr._insert_bulk_columns(client, columns, [10, 11, 12, 13, 14, 15])
+    assert inserted == 4
+    assert [row for row, _ in errors] == [12, 15]
+    assert sorted(client.inserted) == [0, 1, 3, 4]
+    assert sorted(dates) == [0, 1, 3, 4]
+
+
+def test_insert_buffer_retries_requests_one_by_one(db_svr):
+    class Buffer(db_svr.InsertBuffer):
+        def _insert(self, rows):
+            if any(row == "bad" for row in rows):
+                raise RuntimeError("rejected")
+            self.inserted = getattr(self, "inserted", []) + list(rows)
+
+    buffer = Buffer()
+    tickets = [db_svr.InsertTicket(1) for _ in range(3)]
+    buffer._flush([(["a"], tickets[0]), (["bad"], tickets[1]), (["c"], tickets[2])])
+    assert buffer.inserted == ["a", "c"]
+    assert tickets[0].error is None and tickets[2].error is None
+    assert isinstance(tickets[1].error, RuntimeError)
+    assert all(ticket.wait(0) for ticket in tickets)
@@ -0,0 +1,70 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_cursor_round_trip(db_svr):
+    window = (_utc(2024, 4, 1), _utc(2024, 4, 30, 23, 59, 59))
+    empty = [(_utc(2024, 2, 1), _utc(2024, 3, 31, 23, 59, 59))]
+    token = db_svr.encode_search_cursor(("2024-04-12T08:30:00Z", -1001, 42), window, empty)
+    assert db_svr.is_search_cursor(token)
+    assert "=" not in token
+    decoded = db_svr.decode_search_cursor(token)
+    assert decoded["key"] == ("2024-04-12T08:30:00Z", -1001, 42)
+    assert decoded["window"] == window
+    assert decoded["empty"] == empty
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "2024-04-12T08:30:00Z",
+        "c1.!!!",
+        "c1." + base64.urlsafe_b64encode(json.dumps({"k": [1, 2]}).encode()).decode(),
+        "c1." + base64.urlsafe_b64encode(
+            json.dumps({"k": ["d", "x", 1], "w": ["2024-01-01", "2024-02-01"]}).encode()
+        ).decode(),
+    ],
+)
+def test_invalid_cursor(db_svr, token):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        db_svr.decode_search_cursor(token)
+
+
+def _assert_contiguous(windows, cursor, earliest):
+    # Fenêtres semi-ouvertes [lower, upper) : sans trou ni recouvrement
+    assert windows[0][1] == cursor
+    assert windows[-1][0] <= earliest
+    for (lower, _), (_, next_upper) in zip(windows, windows[1:]):
+        assert lower - timedelta(seconds=1) < next_upper <= lower
+    assert all(lower <= upper for lower, upper in windows)
+
+
+def test_month_windows(db_svr, monkeypatch):
+    monkeypatch.setattr(db_svr, "current_metadata", lambda: db_svr._DEFAULT_METADATA)
+    cursor, earliest = _utc(2024, 3, 15, 12), _utc(2023, 12, 20)
+    windows = list(db_svr.plan_search_windows(cursor, earliest))
+    assert [lower.month for lower, _ in windows] == [3, 2, 1, 12]
+    _assert_contiguous(windows, cursor, earliest)
+
+
+def test_partition_windows(db_svr, monkeypatch):
+    ranges = (
+        (_utc(2024, 3, 1), _utc(2024, 3, 31, 23, 59, 59), 3 * db_svr.SEARCH_WINDOW_ROWS),
+        (_utc(2024, 2, 1), _utc(2024, 2, 29, 23, 59, 59), 10),
+        (_utc(2024, 1, 1), _utc(2024, 1, 31, 23, 59, 59), 10),
+    )
+    meta = db_svr._DEFAULT_METADATA._replace(partition_ranges=ranges)
+    monkeypatch.setattr(db_svr, "current_metadata", lambda: meta)
+    cursor, earliest = _utc(2024, 4, 2), _utc(2024, 1, 1)
+    windows = list(db_svr.plan_search_windows(cursor, earliest))
+    _assert_contiguous(windows, cursor, earliest)
+    # Mars est découpé, février et janvier (presque vides) sont regroupés
+    assert len(windows) == 4
+    assert windows[-1][0] == earliest